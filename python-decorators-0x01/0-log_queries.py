@@ -1,52 +1,231 @@
 import sqlite3
 import functools
 import sys
-from datetime import datetime
+import atexit
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from helper_function import StatsConnection, normalize_query
 
 #### decorator to lof SQL queries
 """ YOUR CODE GOES HERE"""
 
-def log_queries(func):
+# --- Structured query log ---
+class QueryLogger:
+    """
+    Collects one JSON record per logged query and writes them from a
+    background thread, so the decorated call only pays for timing and a
+    deque append.
+
+    Records hold: ts (epoch seconds), function, caller ('file:line'),
+    query (normalised, no literal values), params_hash, duration_ns
+    (perf_counter_ns), rows, slow and error (the exception's type and
+    message if the call raised, otherwise null).
+
+    Args:
+        sink: Where records go: a file path, a (host, port) tuple for a TCP
+            socket, or an open text stream. Defaults to sys.stdout.
+        capacity (int): Size of the in-memory ring buffer. When it is full
+            the oldest records are dropped (and counted), never the caller.
+        flush_interval (float): Seconds between background flushes.
+        sample_rate (float): Fraction of queries recorded (0.0 to 1.0).
+        slow_ms (float): Queries at least this slow are always recorded and
+            flagged 'slow'. None disables the threshold.
+        slow_only (bool): Record only queries reaching slow_ms.
+    Calls that raise are always recorded, whatever the sampling.
+    """
+
+    def __init__(self, sink=None, capacity=10000, flush_interval=1.0, sample_rate=1.0,
+                 slow_ms=None, slow_only=False):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0.0 and 1.0.")
+        if slow_only and slow_ms is None:
+            raise ValueError("slow_only needs a slow_ms threshold.")
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.sample_rate = 0.0 if slow_only else sample_rate
+        self.slow_ns = None if slow_ms is None else int(slow_ms * 1_000_000)
+        self.dropped = 0
+        self.write_errors = 0
+        self._buffer = deque(maxlen=capacity)   # Appends are thread-safe and never block.
+        self._stream = None
+        self._socket = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()   # Serialises flushes.
+        self._thread = None
+
+    def wants(self, duration_ns):
+        """
+        True if a query that took duration_ns should be recorded.
+        """
+        if self.slow_ns is not None and duration_ns >= self.slow_ns:
+            return True
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, record):
+        """
+        Queues a record tuple (see format) without blocking; the oldest is
+        dropped when the buffer is full.
+        """
+        if self._thread is None:
+            self._start()
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(record)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-log-flusher", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._wake.wait(self.flush_interval):
+            self.flush()
+
+    def _write(self, data):
+        if isinstance(self.sink, tuple):
+            if self._socket is None:
+                self._socket = socket.create_connection(self.sink, timeout=5)
+            self._socket.sendall(data.encode("utf-8"))
+        elif isinstance(self.sink, (str, os.PathLike)):
+            if self._stream is None:
+                self._stream = open(self.sink, "a", encoding="utf-8", buffering=1 << 16)
+            self._stream.write(data)
+            self._stream.flush()
+        else:
+            stream = self.sink or sys.stdout
+            stream.write(data)
+            stream.flush()
+
+    def format(self, record):
+        """
+        Turns a queued record tuple into the dictionary that is written.
+        """
+        ts, function, filename, lineno, query, params, duration, rows, error = record
+        return {
+            "ts": ts,
+            "function": function,
+            "caller": f"{filename}:{lineno}",
+            "query": normalize_query(query) if isinstance(query, str) else None,
+            "params_hash": params_hash(params),
+            "duration_ns": duration,
+            "rows": rows,
+            "slow": self.slow_ns is not None and duration >= self.slow_ns,
+            "error": error,
+        }
+
+    def flush(self):
+        """
+        Writes out everything buffered so far. Records that cannot be
+        written (e.g. the socket is down) are discarded and counted.
+        """
+        with self._lock:
+            records = []
+            while self._buffer:
+                try:
+                    records.append(self._buffer.popleft())
+                except IndexError:
+                    break   # Emptied by the time we got to it.
+            if not records:
+                return
+            data = "".join(json.dumps(self.format(record), separators=(",", ":")) + "\n"
+                           for record in records)
+            try:
+                self._write(data)
+            except OSError as e:
+                self.write_errors += len(records)
+                if self._socket is not None:
+                    self._socket.close()
+                    self._socket = None     # Reconnect on the next flush.
+                print(f"Query log write failed, {len(records)} records lost: {e}", file=sys.stderr)
+
+    def close(self):
+        """
+        Stops the background thread and writes out what is left.
+        """
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+
+query_logger = QueryLogger()    # Default logger used by @log_queries.
+
+def params_hash(params):
+    """
+    Short stable hash of bind parameters, so calls can be told apart
+    without logging the values themselves.
+    """
+    if params is None:
+        return None
+    return hashlib.blake2b(repr(params).encode("utf-8"), digest_size=8).hexdigest()
+
+def row_count(result):
+    """
+    Rows in a query result: a list of rows, a single row or None.
+    """
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return 1
+    return 0 if result is None else None
+
+def log_queries(func=None, *, logger=None):
     """
     A decorator that logs the SQL query being executed by the decorated function.
     Assumes the SQL query is passed as the first positional argument or a keyword
-    argument named 'query'
+    argument named 'query', and bind parameters (if any) as the second positional
+    argument or a keyword argument named 'params'.
+    Records go to 'logger' (default: query_logger) as structured JSON lines;
+    see QueryLogger for what is recorded, sampling and slow-query capture.
+    Use it as @log_queries or @log_queries(logger=QueryLogger(...)).
     """
+    if func is None:
+        return lambda func: log_queries(func, logger=logger)
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query_to_log = None
-        # Determine the query argument.
-        if "query" in kwargs:
-            query_to_log = kwargs["query"]
-        elif args:
-            # Assuming the first positional argument is the query
-            query_to_log = args[0]
-            
-        start_time = datetime.now()
-
-        if query_to_log:
-            # Logs the query before execution
-            print(f"[{start_time.strftime('%Y-%m-%d %H:%M:%S')}] Executing SQL Query: '{query_to_log}'", file=sys.stdout)
-        else:
-            # Handles cases where the query argument might not be found
-            print(
-                f"[{start_time.strftime('%Y-%m-%d %H:%M-%S')}] Warning: No identifiable query argument found ofr function '{func.__name__}'",
-                file=sys.stderr,
-            )
-
-        results = func(*args, **kwargs)
-        endtime = datetime.now()
-        execute_time = endtime - start_time
-        
-        print(f"[{endtime.strftime('%Y-%m-%d %H:%M:%S')}] Qury completed in {execute_time.total_seconds():.4f} secons.", file=sys.stdout)
-        return results
+        results = None
+        error = None
+        start = time.perf_counter_ns()
+        try:
+            results = func(*args, **kwargs)
+            return results
+        except Exception as e:
+            # Failed queries (lock timeouts included) are logged too, then re-raised.
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter_ns() - start
+            target = query_logger if logger is None else logger
+            if error is not None or target.wants(duration):
+                # Determine the query argument.
+                query_to_log = kwargs.get("query", args[0] if args else None)
+                params = kwargs.get("params", args[1] if len(args) > 1 else None)
+                caller = sys._getframe(1)
+                # Normalising and hashing are left to the flusher thread.
+                target.record((time.time(), func.__qualname__, caller.f_code.co_filename, caller.f_lineno,
+                               query_to_log, params, duration, None if error else row_count(results), error))
 
     return wrapper
 
 @log_queries
 def fetch_all_users(query):
-    conn = sqlite3.connect("users_db")
+    conn = sqlite3.connect("users_db", factory=StatsConnection)
     cursor = conn.cursor()
     cursor.execute(query)
     results = cursor.fetchall()
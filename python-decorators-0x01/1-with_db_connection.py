@@ -1,6 +1,7 @@
 import sqlite3 
 import functools
 import sys
+from helper_function import StatsConnection
 
 
 def with_db_connection(func):
@@ -13,7 +14,7 @@ def with_db_connection(func):
         conn = None
         try:
             # Open the database connection
-            conn = sqlite3.connect('users_db')
+            conn = sqlite3.connect('users_db', factory=StatsConnection)
             
             # Call the original function, passing the connection as the first argument,
             # followed by any original arguments.
@@ -2,6 +2,9 @@ import sqlite3
 import functools
 import sys
 import time
+import random
+import threading
+from helper_function import StatsConnection, WARMUP_PRAGMAS
 
 def with_db_connection(func):
     """
@@ -17,7 +20,7 @@ def with_db_connection(func):
         conn = None
         try:
             # Open the database connection
-            conn = sqlite3.connect("users_db")
+            conn = sqlite3.connect("users_db", factory=StatsConnection)
 
             # Call the original function, passing the connection as the first argument,
             # followed by any original arguments.
@@ -40,39 +43,212 @@ def with_db_connection(func):
 
     return wrapper
 
+# --- Transient error classification ---
+# SQLite result codes (low byte of sqlite_errorcode) worth retrying.
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+TRANSIENT_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "database schema has changed",
+    "disk i/o error",
+    "temporarily unavailable",
+)
+
+def is_transient(error):
+    """
+    True for errors that may go away on their own (lock contention, a busy
+    database, a brief I/O failure). Everything else, including syntax
+    errors and missing tables, fails at once.
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None and code & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED):
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in TRANSIENT_MESSAGES)
+
+
+# --- Process-wide retry budget ---
+class RetryBudget:
+    """
+    Token bucket shared by every retrying function: each retry takes a
+    token, and tokens come back at 'refill_per_second' up to 'capacity'.
+    During an outage the bucket runs dry and calls fail fast instead of
+    multiplying the load with retries.
+    """
+
+    def __init__(self, capacity=20, refill_per_second=2.0):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Takes one token if there is one. Returns True on success.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            return min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+
+
+retry_budget = RetryBudget()
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+COUNTERS = ("calls", "attempts", "retries", "successes", "recovered", "gave_up_attempts",
+            "gave_up_deadline", "gave_up_budget", "gave_up_transaction", "not_transient",
+            "sleep_seconds")
+
+def _count(name, **amounts):
+    with _metrics_lock:
+        counters = _metrics.setdefault(name, dict.fromkeys(COUNTERS, 0))
+        for key, amount in amounts.items():
+            counters[key] += amount
+
+def retry_metrics():
+    """
+    Returns {function name: counters} plus a 'total' entry. Counters:
+    calls, attempts, retries, successes, recovered (succeeded after a
+    retry), gave_up_attempts / gave_up_deadline / gave_up_budget /
+    gave_up_transaction (why a call failed after transient errors),
+    not_transient (errors raised without retrying) and sleep_seconds.
+    """
+    with _metrics_lock:
+        snapshot = {name: dict(counters) for name, counters in _metrics.items()}
+    snapshot["total"] = {key: sum(counters[key] for counters in snapshot.values()) for key in COUNTERS}
+    return snapshot
+
+def fresh_connection(conn):
+    """
+    The default reconnect hook of retry_on_failure: opens a new connection
+    to the database file behind 'conn', of the same class and with the same
+    row_factory, text_factory, isolation_level and warm-up PRAGMAs.
+    An in-memory or temporary database cannot be reopened and raises
+    OperationalError.
+    """
+    path = ""
+    for _, name, file in sqlite3.Cursor(conn).execute("PRAGMA database_list"):
+        if name == "main":
+            path = file
+    if not path:
+        raise sqlite3.OperationalError("cannot reopen an in-memory or temporary database")
+    fresh = sqlite3.connect(path, factory=type(conn), isolation_level=conn.isolation_level)
+    fresh.row_factory = conn.row_factory
+    fresh.text_factory = conn.text_factory
+    cursor = sqlite3.Cursor(fresh)
+    for pragma in WARMUP_PRAGMAS:
+        cursor.execute(pragma).fetchall()
+    cursor.close()
+    return fresh
+
 # --- retry_on_failuire decorator ---
-def retry_on_failure(retries=3, delay=2):
+def retry_on_failure(retries=3, delay=2, max_delay=30, deadline=None, budget=None,
+                     transient=is_transient, reconnect=fresh_connection):
     """
-    A decorator that retries a function if it raises and exception.
+    A decorator that retries a function when it raises a transient error.
+
+    Waits follow exponential backoff with full jitter: before retry n the
+    function sleeps a random time between 0 and min(max_delay, delay * 2**n)
+    seconds, so callers that failed together do not retry together. Every
+    retry also needs a token from 'budget' (default: the process-wide
+    retry_budget).
+
+    When the first argument is a sqlite3.Connection (e.g. under
+    with_db_connection), a failed attempt is rolled back and each retry
+    runs on a new connection from 'reconnect' (default: fresh_connection),
+    so a connection left broken by the failure is not reused. Functions
+    wrapped in @transactional must pass reconnect=None instead: the retry
+    then runs on the same connection, so the outer decorator still commits
+    it. If the connection already had a transaction open when the call
+    started, rolling back would discard the caller's writes, so the error
+    is raised without retrying.
 
     Args:
-        retries (int, opional): The maximum number of times to retrey the function. Defaults to 3.
-        delay (int, optional): The delay in secons between retries. Defaults to 2.
+        retries (int, opional): The maximum number of attempts. Defaults to 3.
+        delay (float, optional): Base delay in seconds for the backoff. Defaults to 2.
+        max_delay (float, optional): Cap on a single wait. Defaults to 30.
+        deadline (float, optional): Seconds after the first attempt past which
+            no retry is started. Defaults to None (no deadline).
+        budget (RetryBudget, optional): Token bucket limiting retries.
+        transient (callable, optional): Decides which exceptions are retried.
+        reconnect (callable, optional): Called with the original connection
+            to get a new one for each retry, which is closed afterwards.
+            Defaults to fresh_connection; None retries on the same connection.
     """
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            name = func.__qualname__
+            tokens = retry_budget if budget is None else budget
+            start = time.monotonic()
+            conn = args[0] if args and isinstance(args[0], sqlite3.Connection) else None
+            outer_transaction = conn is not None and conn.in_transaction
+            _count(name, calls=1)
             for i in range(retries):
+                call_args = args
+                fresh = None
                 try:
-                    print(f"Attempt {i + 1}/{retries} for '{func.__name__}'...", file=sys.stderr)
-                    return func(*args, **kwargs)
+                    if i and conn is not None and reconnect is not None:
+                        fresh = reconnect(conn)
+                        call_args = (fresh,) + args[1:]
+                    _count(name, attempts=1)
+                    result = func(*call_args, **kwargs)
+                    _count(name, successes=1, recovered=1 if i else 0)
+                    return result
                 except Exception as e:
-                    last_exception = e
-                    print(f"Attempt {i + 1} failed for '{func.__name__}': {e}", file=sys.stderr)
-                    if i < retries - 1:
-                        print(f"Retrying in {delay} seconds...", file=sys.stderr)
-                        time.sleep(delay)
-                        
-            print(f"All {retries} attempts failed for '{func.__name__}'.", file=sys.stderr)
-            if last_exception:
-                raise last_exception
-            raise Exception(f"Function '{func.__name__}' failed after {retries} retries with no specific exception caught.")
+                    if not transient(e):
+                        _count(name, not_transient=1)
+                        raise
+                    print(f"Attempt {i + 1}/{retries} failed for '{func.__name__}': {e}", file=sys.stderr)
+                    if outer_transaction:
+                        _count(name, gave_up_transaction=1)
+                        print(f"Not retrying '{func.__name__}': it runs inside a transaction it did not open.",
+                              file=sys.stderr)
+                        raise
+                    if i == retries - 1:
+                        _count(name, gave_up_attempts=1)
+                        print(f"All {retries} attempts failed for '{func.__name__}'.", file=sys.stderr)
+                        raise
+                    wait = random.uniform(0, min(max_delay, delay * 2 ** i))
+                    if deadline is not None and time.monotonic() - start + wait > deadline:
+                        _count(name, gave_up_deadline=1)
+                        print(f"Giving up on '{func.__name__}': retrying would pass the {deadline}s deadline.",
+                              file=sys.stderr)
+                        raise
+                    if not tokens.try_acquire():
+                        _count(name, gave_up_budget=1)
+                        print(f"Giving up on '{func.__name__}': retry budget exhausted.", file=sys.stderr)
+                        raise
+                    if conn is not None:
+                        call_args[0].rollback()     # Undo the failed attempt's partial writes.
+                    _count(name, retries=1, sleep_seconds=wait)
+                    print(f"Retrying in {wait:.2f} seconds...", file=sys.stderr)
+                    time.sleep(wait)
+                finally:
+                    if fresh is not None:
+                        fresh.close()
         return wrapper
+    if retries < 1:
+        raise ValueError("retries must be at least 1.")
     return decorator
 
 @with_db_connection
-@retry_on_failure(retries=3, delay=1)
+@retry_on_failure(retries=3, delay=1, reconnect=fresh_connection)
 def fetch_users_with_retry(conn):
     """
     Fetches all users from the database, with automatic retry on failure.
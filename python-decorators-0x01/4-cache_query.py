@@ -1,9 +1,13 @@
 import sqlite3
 import functools
+import inspect
+import re
 import sys
+import threading
 import time
-
-query_cache = {}    # Global cache for query result
+import weakref
+from collections import OrderedDict
+from helper_function import StatsConnection
 
 def with_db_connection(func):
     """
@@ -19,7 +23,7 @@ def with_db_connection(func):
         conn = None
         try:
             # Open the database connection
-            conn = sqlite3.connect("users_db")
+            conn = sqlite3.connect("users_db", factory=StatsConnection)
 
             # Call the original function, passing the connection as the first argument,
             # followed by any original arguments.
@@ -42,35 +46,254 @@ def with_db_connection(func):
 
     return wrapper
 
+# --- Query result cache ---
+# Tables a statement reads from or writes to. Good enough for the simple
+# statements used here; a statement whose tables cannot be found is treated
+# as depending on every table.
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+["`\[]?(\w+)', re.IGNORECASE)
+WRITE_PATTERN = re.compile(r'^\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+def tables_in(query):
+    """
+    Returns the lower-cased names of the tables mentioned in a SQL statement.
+    """
+    return frozenset(name.lower() for name in TABLE_PATTERN.findall(query))
+
+def result_size(value):
+    """
+    Approximate memory footprint in bytes of a query result (rows of values).
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(map(sys.getsizeof, row))
+    return size
+
+def database_path(conn):
+    """
+    The file behind the connection's main database ('' for in-memory ones),
+    so identical queries against different files get different cache keys.
+    """
+    # A plain cursor keeps this lookup out of the query statistics.
+    for _, name, path in sqlite3.Cursor(conn).execute("PRAGMA database_list"):
+        if name == "main":
+            return path
+    return ""
+
+
+class QueryCache:
+    """
+    Thread-safe cache of query results, bounded by an approximate byte
+    budget. The least recently used entries are evicted first, and every
+    entry expires after its time-to-live (seconds, None for never).
+    Entries remember the tables they read, so invalidate() drops only the
+    results a write can have changed. Every live cache is registered in
+    live_caches, so transactional invalidates all of them.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (result, size, expires_at, tables); oldest first.
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                       "invalidations": 0, "too_large": 0}
+        live_caches.add(self)
+
+    def _drop(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """
+        Returns (True, result) for a live entry, (False, None) otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._drop(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[0]
+
+    def put(self, key, result, tables=frozenset(), ttl=None):
+        """
+        Stores a result, evicting least recently used entries to stay within
+        the byte budget. Results larger than the whole budget are not kept.
+        """
+        size = result_size(result)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                self._stats["too_large"] += 1
+                return
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            self._entries[key] = (result, size, expires_at, tables)
+            self._bytes += size
+
+    def invalidate(self, tables=None):
+        """
+        Drops the entries that read any of 'tables' (and those whose tables
+        are unknown). tables=None drops everything. Returns the number dropped.
+        """
+        with self._lock:
+            if tables is None:
+                stale = list(self._entries)
+            else:
+                tables = {table.lower() for table in tables}
+                stale = [key for key, (_, _, _, read) in self._entries.items()
+                         if not read or read & tables]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidations"] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        self.invalidate()
+
+    def metrics(self):
+        """
+        Returns hits, misses, hit_ratio, evictions, expirations,
+        invalidations, too_large, entries, bytes and max_bytes.
+        """
+        with self._lock:
+            snapshot = dict(self._stats, entries=len(self._entries), bytes=self._bytes,
+                            max_bytes=self.max_bytes)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+live_caches = weakref.WeakSet()     # Every QueryCache still in use.
+
+def invalidate_all(tables=None):
+    """
+    Calls invalidate(tables) on every live QueryCache. Returns the total
+    number of entries dropped.
+    """
+    return sum(cache.invalidate(tables) for cache in list(live_caches))
+
+query_cache = QueryCache()    # Global cache for query results
+
+def freeze(value):
+    """
+    Makes bind parameters hashable so they can be part of a cache key.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
 # --- cache_query decorator---
-def cache_query(func):
+def cache_query(func=None, *, ttl=None, cache=None):
     """
-    A decorator that caches the results of a database query based on the SQL query string
-    to avoid redundant calls.
-    Assumes the quer string is passed as the 'query' keyword or the second positianl arggument to the
-    decorated function
+    A decorator that caches the results of a database query. The cache key
+    is the database file, the SQL query string and every other argument
+    (i.e. the bind parameters), so different parameters or databases never
+    share a result.
+    Assumes the connection is the first positional argument and the query
+    string is passed as the 'query' keyword or the second positional argument
+    to the decorated function.
+    Results are kept in 'cache' (default: query_cache) for 'ttl' seconds
+    (default: the cache's own ttl). Use it as @cache_query or @cache_query(ttl=60).
 
     Args:
         func (function): The function to be decorated.
     """
+    if func is None:
+        return lambda func: cache_query(func, ttl=ttl, cache=cache)
+
+    signature = inspect.signature(func)
+    names = list(signature.parameters)
+    query_name = 'query' if 'query' in names else (names[1] if len(names) > 1 else None)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query = kwargs.get('query') # query from the keyword arguments
-        
-        if query is None and len(args) > 1:
-            query = args[1]
-            
+        store = query_cache if cache is None else cache
+        # Binding the call makes f(conn, q, p) and f(conn, query=q, params=p)
+        # share one cache entry.
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        conn = arguments.pop(names[0])
+        query = arguments.pop(query_name, None)
+
         if query is None:
             raise ValueError("Cache_query decorator reuquires the SQL query string to be passed as a 'query' keyword argument or the second positional argument.")
         
-        if query in query_cache:
-            print(f"Cache hit or for query: '{query}'", file=sys.stderr)
-            return query_cache[query]
-        else:
-            print(f"Cach miss for query: '{query}'. Executing query...", file=sys.stderr)
-            result = func(*args, **kwargs)
-            query_cache[query] = result
+        key = (database_path(conn), query, freeze(arguments))
+        hit, result = store.get(key)
+        if hit:
+            print(f"Cache hit for query: '{query}'", file=sys.stderr)
             return result
+        print(f"Cache miss for query: '{query}'. Executing query...", file=sys.stderr)
+        result = func(*args, **kwargs)
+        store.put(key, result, tables_in(query), ttl)
+        return result
+    return wrapper
+
+# --- transactional decorator ---
+def transactional(func):
+    """
+    A decorator that wraps a database operation function within a transaction.
+    If the decorated function raises an error, the transaction is rolled back;
+    otherwise, it is commited and cached results that read the tables it
+    wrote to are invalidated, in query_cache and every other QueryCache.
+
+    Args:
+        func (callable): The function to be decorated.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not args or not isinstance(args[0], sqlite3.Connection):
+            raise TypeError(
+                f"Function '{func.__name__}' decorated with @transactional "
+                "must recieve a sqlite3.Connection object as its first argument."
+            )
+
+        conn = args[0]
+        written = set()
+        def trace(statement):
+            if WRITE_PATTERN.match(statement):
+                written.update(tables_in(statement))
+        # The trace callback sees every statement the function executes,
+        # including those run from sqlite3's statement cache.
+        conn.set_trace_callback(trace)
+        try:
+            result = func(*args, **kwargs)
+            conn.commit()
+            print(f"Transaction committed for '{func.__name__}'.", file=sys.stderr)
+        except Exception as e:
+            conn.rollback()
+            print(f"Transaction rolled back for '{func.__name__}' due to error: {e}", file=sys.stderr)
+            raise
+        finally:
+            conn.set_trace_callback(None)
+        if written:
+            invalidate_all(written)
+        return result
     return wrapper
 
 @with_db_connection
@@ -84,4 +307,5 @@ def fetch_users_with_cache(conn, query):
 users = fetch_users_with_cache(query="SELECT * FROM users")
 
 #### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users") 
\ No newline at end of file
+users_again = fetch_users_with_cache(query="SELECT * FROM users")
+print(query_cache.metrics(), file=sys.stderr)
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Calls per second of a decorated lookup with per-call connections versus
+the pooled with_db_connection from helper_function.
+
+Runs against a throwaway database with its own 'users' table, so it does
+not touch users_db:
+
+    python3 bench_connections.py --calls 20000 --threads 1 4
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import helper_function
+
+def create_database(path, rows=1000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     ((i, f"User {i}", f"user{i}@example.com", 18 + i % 60) for i in range(1, rows + 1)))
+    conn.commit()
+    conn.close()
+
+def run(get_user, calls, threads):
+    """
+    Makes 'calls' lookups spread over 'threads' threads; returns calls/s.
+    """
+    per_thread = calls // threads
+    def work(offset):
+        for i in range(per_thread):
+            get_user((offset + i) % 1000 + 1)
+    workers = [threading.Thread(target=work, args=(n * per_thread,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-call SQLite connections.")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--pool-size", type=int, default=helper_function.POOL_SIZE)
+    parser.add_argument("--check-on-borrow", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench_users.db")
+        create_database(path)
+        pool = helper_function.SQLiteConnectionPool(path, size=args.pool_size,
+                                                     check_on_borrow=args.check_on_borrow)
+
+        def lookup(conn, user_id):
+            return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        modes = {
+            "per-call": helper_function.with_db_connection(lookup, pooled=False, database=path),
+            "pooled": helper_function.with_db_connection(lookup, pool=pool),
+        }
+        print(f"{'threads':>8} {'mode':<10} {'calls/s':>12}")
+        for threads in args.threads:
+            results = {}
+            for mode, get_user in modes.items():
+                results[mode] = run(get_user, args.calls, threads)
+                print(f"{threads:>8} {mode:<10} {results[mode]:>12,.0f}")
+            print(f"{'':>8} {'speedup':<10} {results['pooled'] / results['per-call']:>11.1f}x")
+        print(pool.metrics())
+        pool.close()
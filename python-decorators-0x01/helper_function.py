@@ -0,0 +1,598 @@
+import sqlite3
+import bisect
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+# --- Database Configuration ---
+DB_PATH = "users_db"
+POOL_SIZE = 5
+ACQUIRE_TIMEOUT = 30    # Seconds to wait for a free connection.
+
+# Applied once to every new pooled connection, not on every call.
+WARMUP_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",   # Wait for locks instead of failing at once.
+    "PRAGMA cache_size = -8000",    # 8 MiB page cache, kept warm between calls.
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# --- Query normalisation ---
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SPACE_PATTERN = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=1024)
+def normalize_query(query):
+    """
+    Returns the shape of a SQL statement: comments removed, string and
+    number literals replaced by '?', IN lists collapsed to '(?)' and
+    whitespace squeezed. Queries that differ only in their values share
+    a shape, and no user data ends up in logs.
+    """
+    query = COMMENT_PATTERN.sub(" ", query)
+    query = LITERAL_PATTERN.sub("?", query)
+    query = IN_LIST_PATTERN.sub("(?)", query)
+    return SPACE_PATTERN.sub(" ", query).strip().rstrip(";").rstrip()
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Returns (fingerprint, normalised query): a short stable id for the
+    shape of a statement, shared by every call that differs only in values.
+    """
+    normalized = normalize_query(query)
+    digest = hashlib.blake2b(normalized.lower().encode("utf-8"), digest_size=8).hexdigest()
+    return digest, normalized
+
+
+# --- Query statistics ---
+# Upper bounds (seconds) of the Prometheus histogram buckets.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENCY_BUCKETS_NS = tuple(int(bound * 1e9) for bound in LATENCY_BUCKETS)
+SUB_BUCKETS = 8     # Fine buckets per doubling: percentiles are within ~5%.
+
+
+class LatencyHistogram:
+    """
+    Streaming latency histogram in constant memory. Fine log-scale buckets
+    give percentile estimates; the fixed LATENCY_BUCKETS counts are what
+    the Prometheus dump exposes.
+    """
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns", "_fine", "_coarse")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+        self._fine = {}     # log2(ns) * SUB_BUCKETS, rounded down -> count
+        self._coarse = [0] * (len(LATENCY_BUCKETS_NS) + 1)  # Last slot is +Inf.
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if self.max_ns is None or ns > self.max_ns:
+            self.max_ns = ns
+        index = int(math.log2(ns) * SUB_BUCKETS) if ns > 1 else 0
+        self._fine[index] = self._fine.get(index, 0) + 1
+        self._coarse[bisect.bisect_left(LATENCY_BUCKETS_NS, ns)] += 1
+
+    def percentile(self, percentile):
+        """
+        Estimated latency (ns) at 'percentile' (0-100), or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(percentile / 100 * self.count), 1)
+        seen = 0
+        for index in sorted(self._fine):
+            seen += self._fine[index]
+            if seen >= rank:
+                middle = 2 ** ((index + 0.5) / SUB_BUCKETS)   # Geometric middle of the bucket.
+                return min(max(middle, self.min_ns), self.max_ns)
+        return self.max_ns
+
+    def cumulative_buckets(self):
+        """
+        Yields (le, cumulative count) pairs, ending with ('+Inf', count).
+        """
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self._coarse):
+            seen += count
+            yield bound, seen
+
+
+class QueryStats:
+    """
+    Aggregates for one query fingerprint.
+    """
+    __slots__ = ("fingerprint", "query", "functions", "rows", "latency")
+
+    def __init__(self, fingerprint, query):
+        self.fingerprint = fingerprint
+        self.query = query
+        self.functions = set()
+        self.rows = 0
+        self.latency = LatencyHistogram()
+
+    def to_dict(self):
+        latency = self.latency
+        ms = lambda ns: ns / 1e6 if ns is not None else None
+        return {
+            "fingerprint": self.fingerprint,
+            "query": self.query,
+            "functions": sorted(self.functions),
+            "calls": latency.count,
+            "total_ms": ms(latency.total_ns),
+            "mean_ms": ms(latency.total_ns / latency.count) if latency.count else None,
+            "p50_ms": ms(latency.percentile(50)),
+            "p95_ms": ms(latency.percentile(95)),
+            "p99_ms": ms(latency.percentile(99)),
+            "max_ms": ms(latency.max_ns),
+            "rows": self.rows,
+            "mean_rows": self.rows / latency.count if latency.count else None,
+        }
+
+
+def prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StatsRegistry:
+    """
+    Process-wide, thread-safe statistics per query fingerprint: call
+    count, total/mean/p95/p99 latency, rows and the functions issuing it.
+    Filled by StatsCursor; dump it with to_json() or to_prometheus().
+    """
+
+    def __init__(self, batch_size=1024):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stats = {}        # fingerprint -> QueryStats
+        self._by_query = {}     # raw query text -> QueryStats, to skip fingerprinting
+        # Observations are queued (a lock-free append) and folded into the
+        # histograms in batches, off the per-statement path.
+        self._queue = deque()
+
+    def observe(self, query, duration_ns, rows, function=None):
+        self._queue.append((query, duration_ns, rows, function))
+        if len(self._queue) >= self.batch_size:
+            self.drain()
+
+    def drain(self):
+        """
+        Folds the queued observations into the per-fingerprint statistics.
+        """
+        queue, by_query = self._queue, self._by_query
+        with self._lock:
+            while queue:
+                try:
+                    query, duration_ns, rows, function = queue.popleft()
+                except IndexError:
+                    break
+                stats = by_query.get(query)
+                if stats is None:
+                    key, normalized = fingerprint(query)
+                    stats = self._stats.get(key)
+                    if stats is None:
+                        stats = self._stats[key] = QueryStats(key, normalized)
+                    if len(by_query) >= 4096:
+                        by_query.clear()
+                    by_query[query] = stats
+                stats.latency.add(duration_ns)
+                stats.rows += rows
+                if function is not None:
+                    stats.functions.add(function)
+
+    def snapshot(self, sort_by="total_ms"):
+        """
+        Returns a list of per-fingerprint dictionaries (see QueryStats.to_dict),
+        the most expensive first.
+        """
+        self.drain()
+        with self._lock:
+            entries = [stats.to_dict() for stats in self._stats.values()]
+        return sorted(entries, key=lambda entry: entry[sort_by] or 0, reverse=True)
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix="sqlite_query"):
+        """
+        Returns the statistics in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {prefix}_duration_seconds Latency of SQL statements by fingerprint.",
+                 f"# TYPE {prefix}_duration_seconds histogram"]
+        rows = [f"# HELP {prefix}_rows_total Rows returned or changed by SQL statements.",
+                f"# TYPE {prefix}_rows_total counter"]
+        self.drain()
+        with self._lock:
+            for stats in self._stats.values():
+                labels = f'fingerprint="{stats.fingerprint}",query="{prometheus_label(stats.query)}"'
+                for bound, count in stats.latency.cumulative_buckets():
+                    lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{prefix}_duration_seconds_sum{{{labels}}} {stats.latency.total_ns / 1e9}")
+                lines.append(f"{prefix}_duration_seconds_count{{{labels}}} {stats.latency.count}")
+                rows.append(f"{prefix}_rows_total{{{labels}}} {stats.rows}")
+        return "\n".join(lines + rows) + "\n"
+
+    def dump(self, path, format="json"):
+        """
+        Writes the statistics to 'path' as 'json' or 'prometheus' text.
+        """
+        if format not in ("json", "prometheus"):
+            raise ValueError("format must be 'json' or 'prometheus'.")
+        text = self.to_json() if format == "json" else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def reset(self):
+        with self._lock:
+            self._queue.clear()
+            self._stats.clear()
+            self._by_query.clear()
+
+
+stats_registry = StatsRegistry()
+
+
+class StatsCursor(sqlite3.Cursor):
+    """
+    Cursor that reports every statement it runs to stats_registry. A
+    statement's latency covers execute() plus the fetches that follow, and
+    is recorded once its rows are exhausted, on the next execute(), or when
+    the cursor is closed or garbage collected.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = None    # [sql, elapsed ns, rows, function] of the running statement.
+
+    def _caller(self):
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_code.co_filename == __file__:
+            frame = frame.f_back    # Skip StatsConnection and the decorators here.
+        return frame.f_code.co_name if frame is not None else None
+
+    def _started(self, sql, elapsed):
+        if self.description is None:    # No result rows: count the rows changed.
+            stats_registry.observe(sql, elapsed, max(self.rowcount, 0), self._caller())
+        else:
+            self._pending = [sql, elapsed, 0, self._caller()]
+        return self
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            stats_registry.observe(*pending)
+
+    def execute(self, sql, parameters=()):
+        if self._pending is not None:
+            self._finish()
+        start = time.perf_counter_ns()
+        super().execute(sql, parameters)
+        return self._started(sql, time.perf_counter_ns() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._pending is not None:
+            self._finish()
+        start = time.perf_counter_ns()
+        super().executemany(sql, seq_of_parameters)
+        return self._started(sql, time.perf_counter_ns() - start)
+
+    def fetchone(self):
+        start = time.perf_counter_ns()
+        row = super().fetchone()
+        pending = self._pending
+        if pending is not None:
+            pending[1] += time.perf_counter_ns() - start
+            if row is None:
+                self._finish()
+            else:
+                pending[2] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter_ns()
+        rows = super().fetchmany(size)
+        pending = self._pending
+        if pending is not None:
+            pending[1] += time.perf_counter_ns() - start
+            pending[2] += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter_ns()
+        rows = super().fetchall()
+        pending = self._pending
+        if pending is not None:
+            pending[1] += time.perf_counter_ns() - start
+            pending[2] += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter_ns()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            if self._pending is not None:
+                self._pending[1] += time.perf_counter_ns() - start
+                self._finish()
+            raise
+        pending = self._pending
+        if pending is not None:
+            pending[1] += time.perf_counter_ns() - start
+            pending[2] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass    # Interpreter shutdown; nothing left to record into.
+
+
+class StatsConnection(sqlite3.Connection):
+    """
+    Connection whose cursors are StatsCursors, so every statement is
+    counted in stats_registry. Pass it as sqlite3.connect(..., factory=StatsConnection).
+    """
+
+    def cursor(self, factory=StatsCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """
+    Raised when no connection becomes free within the acquire timeout.
+    Being a sqlite3.Error, it is handled wherever database errors are.
+    """
+
+
+class SQLiteConnectionPool:
+    """
+    Thread-safe pool of SQLite connections.
+
+    A thread gets back the connection it used last whenever that one is
+    idle (per-thread affinity), which keeps its page cache and prepared
+    statements warm. Otherwise it takes the most recently returned idle
+    connection, or opens a new one while fewer than 'size' are open.
+    New connections run 'pragmas' once. With check_on_borrow=True an idle
+    connection is tested with 'SELECT 1' before it is handed out and
+    replaced if that fails. Connections are created with 'factory'
+    (StatsConnection by default, so their statements are counted).
+    """
+
+    def __init__(self, database=DB_PATH, size=POOL_SIZE, pragmas=WARMUP_PRAGMAS,
+                 check_on_borrow=False, acquire_timeout=ACQUIRE_TIMEOUT, factory=None):
+        if size <= 0:
+            raise ValueError("size must be a positive integer.")
+        self.database = database
+        self.size = size
+        self.pragmas = tuple(pragmas)
+        self.check_on_borrow = check_on_borrow
+        self.acquire_timeout = acquire_timeout
+        self.factory = factory or StatsConnection
+
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._idle = {}     # id(connection) -> connection; most recently returned last.
+        self._slots = 0     # Connections open or being opened.
+        self._in_use = 0
+        self._stats = {"acquired": 0, "affinity_hits": 0, "timeouts": 0, "wait_seconds": 0.0,
+                       "max_wait_seconds": 0.0, "opened": 0, "closed": 0, "failed_checks": 0}
+
+    def _open(self):
+        # Connections move between threads, one borrower at a time.
+        connection = sqlite3.connect(self.database, check_same_thread=False, factory=self.factory)
+        try:
+            for pragma in self.pragmas:
+                sqlite3.Cursor(connection).execute(pragma)  # Plain cursor: not counted in the stats.
+        except sqlite3.Error:
+            connection.close()
+            raise
+        with self._condition:
+            self._stats["opened"] += 1
+        return connection
+
+    def _close(self, connection):
+        with self._condition:
+            self._stats["closed"] += 1
+            self._slots -= 1
+            self._condition.notify()
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def _healthy(self, connection):
+        try:
+            sqlite3.Cursor(connection).execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            with self._condition:
+                self._stats["failed_checks"] += 1
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Returns a connection, waiting up to 'timeout' seconds (default: the
+        pool's acquire_timeout) for one to become free.
+        Raises PoolTimeout if none does.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._slots >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No connection to '{self.database}' became free within {timeout}s "
+                            f"(pool size {self.size}).")
+                    self._condition.wait(remaining)
+                preferred = getattr(self._local, "connection", None)
+                connection = self._idle.pop(id(preferred), None) if preferred is not None else None
+                if connection is not None:
+                    self._stats["affinity_hits"] += 1
+                elif self._idle:
+                    connection = self._idle.pop(next(reversed(self._idle)))
+                else:
+                    self._slots += 1    # Reserve the slot before connecting outside the lock.
+
+            if connection is None:
+                try:
+                    connection = self._open()
+                except BaseException:
+                    with self._condition:
+                        self._slots -= 1
+                        self._condition.notify()
+                    raise
+            elif self.check_on_borrow and not self._healthy(connection):
+                self._close(connection)
+                continue
+
+            waited = time.monotonic() - start
+            with self._condition:
+                self._in_use += 1
+                self._stats["acquired"] += 1
+                self._stats["wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._local.connection = connection
+            return connection
+
+    def release(self, connection):
+        """
+        Takes back a connection handed out by acquire(), rolling back any
+        transaction left open so the next borrower starts clean.
+        """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            with self._condition:
+                self._in_use -= 1
+            self._close(connection)
+            return
+        with self._condition:
+            self._in_use -= 1
+            self._idle[id(connection)] = connection
+            self._condition.notify()
+
+    def close(self):
+        """
+        Closes every idle connection. Connections in use are kept until
+        they are released.
+        """
+        with self._condition:
+            idle, self._idle = list(self._idle.values()), {}
+        for connection in idle:
+            self._close(connection)
+
+    def metrics(self):
+        """
+        Returns a snapshot of the pool's counters: size, in_use, idle,
+        acquired, affinity_hits, timeouts, wait_seconds (total),
+        avg_wait_seconds, max_wait_seconds, opened, closed and failed_checks.
+        """
+        with self._condition:
+            snapshot = dict(self._stats, size=self.size, in_use=self._in_use, idle=len(self._idle))
+        acquired = snapshot["acquired"]
+        snapshot["avg_wait_seconds"] = snapshot["wait_seconds"] / acquired if acquired else 0.0
+        return snapshot
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _forget_pools_after_fork():
+    # A forked child must not share the parent's SQLite handles.
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_pools_after_fork)
+
+def get_pool(database=DB_PATH, **options):
+    """
+    Returns the shared pool for 'database', creating it with 'options'
+    (see SQLiteConnectionPool) on first use.
+    """
+    with _pools_lock:
+        if database not in _pools:
+            _pools[database] = SQLiteConnectionPool(database, **options)
+        return _pools[database]
+
+def pool_metrics():
+    """
+    Returns {database: metrics} for every pool in this process.
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {database: pool.metrics() for database, pool in pools}
+
+
+def with_db_connection(func=None, *, pooled=True, pool=None, database=DB_PATH):
+    """
+    decorator that hands the decorated function a database connection as its
+    first argument, like the per-file versions. By default the connection is
+    leased from a pool ('pool', or the shared pool for 'database') and given
+    back afterwards; pooled=False opens and closes one per call instead.
+    Database errors are printed and the wrapper returns None.
+    Use it as @with_db_connection or @with_db_connection(pooled=False).
+
+    Args:
+        func (callable): The function to be decorated.
+    """
+    if func is None:
+        return lambda func: with_db_connection(func, pooled=pooled, pool=pool, database=database)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        source = (pool or get_pool(database)) if pooled else None
+        conn = None
+        try:
+            conn = source.acquire() if source else sqlite3.connect(database, factory=StatsConnection)
+            return func(conn, *args, **kwargs)
+        except sqlite3.Error as e:
+            print(f"Database error in '{func.__name__}': {e}", file=sys.stderr)
+            return None
+        except Exception as e:
+            print(f"An unexpected error occured in '{func.__name__}': {e}", file=sys.stderr)
+            return None
+        finally:
+            if conn is not None:
+                if source:
+                    source.release(conn)
+                else:
+                    conn.close()
+    return wrapper
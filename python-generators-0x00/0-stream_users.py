@@ -1,50 +1,83 @@
 from decimal import Decimal
+from functools import partial
+from itertools import chain
 import mysql.connector
+import db_pool
+import schema
+import user_rows
 
 # --- Database Configuration ---
-DB_HOST = "localhost"
-DB_USER = "alx_user"
-DB_PASSWORD = "user_password"
+# Host, user, password and pooling are configured in db_pool.
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
 
-def stream_users():
+# Rows held client-side at a time when streaming.
+DEFAULT_WINDOW_SIZE = 1000
+
+def stream_users(streaming=False, window_size=DEFAULT_WINDOW_SIZE, row_format="dict"):
     """Generator function to fetch rows one by one from the 'user_table' table.
        It connects to the ALX_prodev database and yields each row as a tuple.
        Has no more than 1 loop.
+
+       By default the cursor is buffered, so the whole result set is pulled
+       into memory before the first row is yielded. With streaming=True an
+       unbuffered cursor is used instead and rows are read off the socket
+       window_size at a time, so client memory stays bounded by the window.
+       Closing the generator early (e.g. islice) drops the connection rather
+       than draining the rows that were never asked for.
+
+       row_format="tuple" yields UserRow namedtuples instead of dicts; rows
+       are then fetched window_size at a time and converted per window.
     """
+    if (streaming or row_format != "dict") and (not isinstance(window_size, int) or window_size <= 0):
+        raise ValueError("window_size must be a positive integer.")
+    if row_format not in ("dict", "tuple"):
+        raise ValueError("stream_users yields single rows; row_format must be 'dict' or 'tuple'.")
+
     connection = None
     cursor = None
+    exhausted = False
     try:
         # Establish a connection to the ALX_prodev database
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        connection = db_pool.connect(DB_NAME)
         
         if not connection.is_connected():
             print(f"Error: Could not connect to database '{DB_NAME}'. Please check connection details.")
             return  # If the connection fails.
         
-        cursor = connection.cursor(dictionary=True, buffered=True)
+        cursor = connection.cursor(dictionary=(row_format == "dict"), buffered=not streaming)
         
-        select_query = f"SELECT user_id, name, email, age FROM {TABLE_NAME}"
+        layout = schema.describe(connection)
+        select_query = f"SELECT {schema.select_list(layout)} FROM {TABLE_NAME}"
         cursor.execute(select_query)
         
+        rows = cursor
+        if streaming or row_format != "dict":
+            # Flattens fixed-size windows into single rows without a second loop.
+            windows = iter(lambda: cursor.fetchmany(window_size), [])
+            if row_format != "dict":
+                windows = map(partial(user_rows.convert_batch, row_format=row_format,
+                                      columns=cursor.column_names), windows)
+            rows = chain.from_iterable(windows)
+        
         # Iterate through the fetched rows and yield each one(singel loop allowed)
-        for row in cursor:
-            if 'age' in row and isinstance(row['age'], Decimal):
+        for row in rows:
+            if row_format == "dict" and 'age' in row and isinstance(row['age'], Decimal):
                 row['age'] = int(row['age'])
             yield row
+        exhausted = True
             
     except mysql.connector.Error as e:
         print(f"Database error during streaming: {e}")
     except Exception as e:
         print(f"An unexpected error occured: {e}")
     finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
\ No newline at end of file
+        if streaming and not exhausted and connection:
+            # Unread rows are still on the wire; closing the cursor or sending
+            # QUIT would first read them all. Dropping the socket skips that.
+            connection.shutdown()
+        else:
+            if cursor:
+                cursor.close()
+            if connection and connection.leased:
+                connection.close()
\ No newline at end of file
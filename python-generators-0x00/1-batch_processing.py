@@ -1,77 +1,482 @@
-from decimal import Decimal
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
 import mysql.connector
+import db_pool
+import schema
+import user_rows
+from batch_sizing import row_bytes
+from checkpoints import decode_token, encode_token, load_checkpoint, save_checkpoint
 
 # --- Database Configuration ---
-DB_HOST = "localhost"
-DB_USER = "alx_user"
-DB_PASSWORD = "user_password"
+# Host, user, password and pooling are configured in db_pool.
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
 
-def stream_users_in_batches(batch_size):
+# --- Read-ahead ---
+# How often (seconds) a blocked read-ahead thread checks whether to stop.
+READ_AHEAD_POLL = 0.1
+
+def read_ahead(batches, depth):
+    """
+    Generator that pulls from the iterator 'batches' on a background thread,
+    keeping up to 'depth' batches queued ahead of the consumer, so fetching
+    batch N+1 overlaps with the consumer's work on batch N.
+    The bounded queue gives backpressure: the thread blocks once 'depth'
+    batches are waiting. An exception raised while fetching is re-raised in
+    the consumer. Closing this generator stops the thread and closes
+    'batches' on it.
+    """
+    if not isinstance(depth, int) or depth <= 0:
+        raise ValueError("depth must be a positive integer.")
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def offer(message):
+        # Blocks while the queue is full, unless the consumer has gone away.
+        while not stop.is_set():
+            try:
+                buffer.put(message, timeout=READ_AHEAD_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not offer(("batch", batch)):
+                    break
+            else:
+                offer(("done", None))
+        except BaseException as e:
+            offer(("error", e))
+        finally:
+            close = getattr(batches, "close", None)
+            if close:
+                close()
+
+    worker = threading.Thread(target=produce, name="read-ahead", daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, payload = buffer.get()
+            if kind == "batch":
+                yield payload
+            elif kind == "error":
+                raise payload
+            else:
+                return
+    finally:
+        stop.set()
+        worker.join()
+
+def fetch_batches(cursor, batch_size, row_format, sizer=None):
+    """
+    Generator over cursor.fetchmany(batch_size) batches in the given row format.
+    With a 'sizer' (see batch_sizing), each fetch asks it for the size and
+    reports back the time taken and the row size.
+    Database errors are raised, not handled.
+    """
+    while True:
+        if sizer is None:
+            batch = cursor.fetchmany(batch_size)
+        else:
+            start = time.perf_counter()
+            batch = cursor.fetchmany(sizer.size)
+            sizer.record(len(batch), time.perf_counter() - start, row_bytes(batch))
+        if not batch:   # No more rows.
+            return
+        if row_format != "dict":
+            batch = user_rows.convert_batch(batch, row_format, cursor.column_names)
+        yield batch
+
+def batch_token(last_user_id, batch_number):
+    """
+    Resume token for a batch scan, pointing just past 'last_user_id'.
+    """
+    return encode_token({"k": "batches", "id": last_user_id, "n": batch_number})
+
+def stream_users_in_batches(batch_size, row_format="dict", prefetch=0, where=None,
+                            resume_from=None, with_checkpoints=False, sizer=None):
     """
     Generator function to fetch rows from the 'user_data' table in batches.
     Yields a list of rows (each row as a dictionary).
     This function contains exactly 1 loop for fetching batches.
+
+    row_format="tuple" yields lists of UserRow namedtuples and
+    row_format="columns" yields one {column: values} dict per batch
+    (see user_rows). Both convert 'age' to int once per batch.
+
+    prefetch=k reads up to k batches ahead on a background thread over an
+    unbuffered cursor (see read_ahead), overlapping database round trips
+    with the consumer's work. Database errors raised on that thread are
+    handled here like any other.
+
+    'where' is an optional (sql_condition, params) pair evaluated by the
+    server, e.g. ("age > %s", (25,)).
+
+    with_checkpoints=True yields (batch, token) tuples; the token records
+    the batch's last user_id and its batch number. Passing a saved token
+    back as 'resume_from' (with the same 'where') continues with the rows
+    after that batch. Either option reads the table in user_id order, which
+    InnoDB serves straight from the primary key. Saving the token after a
+    batch has been handled gives at-least-once processing; see
+    batch_processing(checkpoint_path=...) for exactly-once file output.
+
+    'sizer' (a batch_sizing.AdaptiveBatchSizer) turns on adaptive batch
+    sizes: each fetch is timed over an unbuffered cursor and the sizer
+    picks the next size from it; batch_size is then ignored. Read the
+    chosen sizes from sizer.metrics().
     """
     if not isinstance(batch_size, int) or batch_size <= 0:
         raise ValueError("batch_size must be a positive integer.")
+    user_rows.validate_row_format(row_format)
+    resume = decode_token(resume_from, kind="batches") if resume_from is not None else None
+    batch_number = resume["n"] if resume else 0
     
     connection = None
     cursor = None
+    batches = None
+    exhausted = False
+    streaming = bool(prefetch) or sizer is not None   # Rows are read from the socket per fetch.
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        connection = db_pool.connect(DB_NAME)
         if not connection.is_connected():
             print(f"Error: Could not connect to database '{DB_NAME}'.")
             return
         
-        cursor = connection.cursor(dictionary=True, buffered=True)
-        select_query = f"SELECT user_id, name, email, age FROM user_data"
-        cursor.execute(select_query)
+        cursor = connection.cursor(dictionary=(row_format == "dict"), buffered=not streaming)
+        layout = schema.describe(connection)
+        select_query = f"SELECT {schema.select_list(layout)} FROM user_data"
+        conditions, params = [], ()
+        if where is not None:
+            conditions.append(f"({where[0]})")
+            params = tuple(where[1])
+        if resume is not None:
+            conditions.append(f"user_id > {schema.user_id_placeholder(layout)}")
+            params += (resume["id"],)
+        if conditions:
+            select_query += " WHERE " + " AND ".join(conditions)
+        if resume is not None or with_checkpoints:
+            select_query += f" ORDER BY {TABLE_NAME}.user_id"
+        cursor.execute(select_query, params)
         
-        while True: # Loop (total): Fetches batches of data
-            batch = cursor.fetchmany(batch_size)
-            if not batch:   # No more rows.
-                break
-            yield batch
+        batches = fetch_batches(cursor, batch_size, row_format, sizer)
+        if prefetch:
+            batches = read_ahead(batches, prefetch)
+        for batch in batches: # Loop (total): Fetches batches of data
+            if with_checkpoints:
+                batch_number += 1
+                yield batch, batch_token(user_rows.last_value(batch, "user_id"), batch_number)
+            else:
+                yield batch
+        exhausted = True
     except mysql.connector.Error as e:
         print(f"Database error during batch streaming: {e}")
     except Exception as e:
         print(f"An unexpected error occured in stream_users_in_batches: {e}")
+    finally:
+        if streaming and not exhausted and connection:
+            if prefetch and batches:
+                batches.close()     # Stops the read-ahead thread before the socket goes.
+            connection.shutdown()   # Skips draining unread rows from the unbuffered cursor.
+        else:
+            if cursor:
+                cursor.close()
+            if connection and connection.leased:
+                connection.close()
+
+# --- Parallel partitioned scan ---
+# Batches each worker may queue ahead of the consumer.
+PARTITION_QUEUE_DEPTH = 4
+
+def partition_clauses(partitions, strategy="hash"):
+    """
+    Splits user_data into 'partitions' disjoint WHERE clauses.
+    "hash" buckets rows by CRC32(user_id) and needs no setup query.
+    "range" cuts the primary key into contiguous, roughly equal ranges, so
+    reading the partitions in order gives rows in user_id order.
+    Returns a list of (where_clause, params) tuples, or None on database errors.
+    """
+    if strategy == "hash":
+        return [("MOD(CRC32(user_id), %s) = %s", (partitions, index)) for index in range(partitions)]
+    if strategy != "range":
+        raise ValueError("strategy must be 'hash' or 'range'.")
+
+    connection = None
+    cursor = None
+    try:
+        connection = db_pool.connect(DB_NAME)
+        layout = schema.describe(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
+        total = cursor.fetchone()[0]
+        boundaries = []
+        for index in range(1, partitions):
+            cursor.execute(f"SELECT {schema.column_expression(layout, 'user_id')} FROM {TABLE_NAME} "
+                           f"ORDER BY {TABLE_NAME}.user_id LIMIT 1 OFFSET %s",
+                           (total * index // partitions,))
+            row = cursor.fetchone()
+            if row and (not boundaries or row[0] > boundaries[-1]):
+                boundaries.append(row[0])
+    except mysql.connector.Error as e:
+        print(f"Database error while planning partitions: {e}", file=sys.stderr)
+        return None
     finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection and connection.leased:
+            connection.close()
+
+    lower = [None] + boundaries
+    upper = boundaries + [None]
+    clauses = []
+    for low, high in zip(lower, upper):
+        conditions, params = [], ()
+        if low is not None:
+            conditions.append(f"user_id >= {schema.user_id_placeholder(layout)}")
+            params += (low,)
+        if high is not None:
+            conditions.append(f"user_id < {schema.user_id_placeholder(layout)}")
+            params += (high,)
+        clauses.append((" AND ".join(conditions) or "TRUE", params))
+    return clauses
+
+def scan_partition(index, where, params, batch_size, row_format, results):
+    """
+    Worker process body: streams one partition and puts its batches on the
+    'results' queue as ("batch", index, batch) messages, followed by
+    ("error", index, message) if it failed and always ("done", index, None).
+    """
+    connection = None
+    try:
+        connection = db_pool.connect(DB_NAME)
+        layout = schema.describe(connection)
+        cursor = connection.cursor(dictionary=(row_format == "dict"))
+        cursor.execute(f"SELECT {schema.select_list(layout)} FROM {TABLE_NAME} WHERE {where} "
+                       f"ORDER BY {TABLE_NAME}.user_id",
+                       params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if row_format != "dict":
+                batch = user_rows.convert_batch(batch, row_format, cursor.column_names)
+            results.put(("batch", index, batch))
+        cursor.close()
+    except Exception as e:
+        results.put(("error", index, f"{type(e).__name__}: {e}"))
+        if connection:
+            connection.shutdown()   # Don't drain unread rows just to say goodbye.
+    finally:
+        if connection and connection.leased:
             connection.close()
+        results.put(("done", index, None))
 
-def batch_processing(batch_size):
-    """
-    Generator function that processes batches of users from 'stream_uusers_in_batches'.
-    Filters users over the age of 25 and converts 'age' from Decimal to int.
-    Yields a list of filtered users for each batch.
-    This function contains 2 loops(one for batchs, one for users within a batch).
-    """
-    for batch in stream_users_in_batches(batch_size):
-        filtered_batch = []
-        for user in batch:
-            current_age = user.get('age')
-            if isinstance(current_age, Decimal):
-                current_age = int(current_age)
-                user['age'] = current_age # Update the dictionary with the int age
-            
-            if current_age is not None and current_age > 25:
-                filtered_batch.append(user)
-                try:
-                    print(user)
-                except OSError as e:
-                    # This takes care of errno 22 (Invalid argument) or 32 (Broken pipe) on windows or Linux respectivel
-                    if e.errno == 22 or e.errno == 32:
-                        return # Exit batch_processing function gracefully
-                    else:
-                        raise   # Other OSError.
-                    
\ No newline at end of file
+def receive(results, workers, waiting_on):
+    """
+    Takes the next message off 'results'. If every worker in 'waiting_on'
+    has died without reporting back, a synthetic error/done pair is used.
+    """
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            for index in waiting_on:
+                if workers[index].exitcode not in (None, 0):
+                    return ("error", index, f"worker exited with code {workers[index].exitcode}")
+
+def stream_users_partitioned(batch_size, partitions=None, strategy="hash",
+                             preserve_order=False, row_format="dict"):
+    """
+    Generator that scans 'user_data' with one worker process per partition,
+    each on its own connection, and merges their batches into one stream.
+    By default batches are yielded as soon as any worker produces them.
+    With preserve_order=True partitions are yielded one after another
+    (with strategy="range" that is user_id order); later workers then run
+    at most PARTITION_QUEUE_DEPTH batches ahead.
+    """
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+    user_rows.validate_row_format(row_format)
+    partitions = partitions or os.cpu_count() or 1
+
+    clauses = partition_clauses(partitions, strategy)
+    if not clauses:
+        return
+
+    context = multiprocessing.get_context()
+    if preserve_order:
+        queues = [context.Queue(PARTITION_QUEUE_DEPTH) for _ in clauses]
+    else:
+        queues = [context.Queue(PARTITION_QUEUE_DEPTH * len(clauses))] * len(clauses)
+    workers = [context.Process(target=scan_partition, daemon=True,
+                               args=(index, where, params, batch_size, row_format, queues[index]))
+               for index, (where, params) in enumerate(clauses)]
+    for worker in workers:
+        worker.start()
+
+    pending = set(range(len(workers)))
+    try:
+        while pending:
+            # Ordered mode drains the lowest unfinished partition first.
+            waiting_on = [min(pending)] if preserve_order else sorted(pending)
+            kind, index, payload = receive(queues[waiting_on[0]], workers, waiting_on)
+            if kind == "batch":
+                yield payload
+            elif kind == "error":
+                print(f"Database error in partition {index}: {payload}", file=sys.stderr)
+                return
+            else:
+                pending.discard(index)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+# --- Batch-level predicates ---
+# A predicate takes a columnar batch (see user_rows) and returns one boolean
+# per row. They work on whole columns at once, so the per-row work runs in
+# C (map/compress) instead of a Python loop. Predicates that can also be
+# written in SQL carry it as 'predicate.sql' = (condition, params), which
+# batch_processing pushes down to the server.
+def age_greater_than(threshold):
+    """
+    Predicate matching users strictly older than 'threshold'.
+    """
+    def predicate(batch):
+        return map(threshold.__lt__, batch["age"])
+    predicate.sql = ("age > %s", (threshold,))
+    return predicate
+
+def age_between(low, high):
+    """
+    Predicate matching users with low <= age <= high.
+    """
+    def predicate(batch):
+        return map(range(low, high + 1).__contains__, batch["age"])
+    predicate.sql = ("age BETWEEN %s AND %s", (low, high))
+    return predicate
+
+def column_in(column, values):
+    """
+    Predicate matching rows whose 'column' value is one of 'values'.
+    """
+    values = frozenset(values)
+    def predicate(batch):
+        return map(values.__contains__, batch[column])
+    if column in ("name", "email", "age") and values:
+        placeholders = ", ".join(["%s"] * len(values))
+        predicate.sql = (f"{column} IN ({placeholders})", tuple(values))
+    return predicate
+
+def all_of(*predicates):
+    """
+    Predicate matching rows accepted by every one of 'predicates'.
+    """
+    def predicate(batch):
+        return map(all, zip(*(p(batch) for p in predicates)))
+    if predicates and all(hasattr(p, "sql") for p in predicates):
+        predicate.sql = (" AND ".join(f"({p.sql[0]})" for p in predicates),
+                         tuple(param for p in predicates for param in p.sql[1]))
+    return predicate
+
+def filter_batch(batch, predicate=None, projection=None):
+    """
+    Applies 'predicate' and then 'projection' (a tuple of column names) to
+    one columnar batch.
+    """
+    if predicate is not None:
+        batch = user_rows.select_rows(batch, predicate(batch))
+    if projection is not None:
+        batch = user_rows.project(batch, projection)
+    return batch
+
+def filter_batches(batches, predicate=None, projection=None):
+    """
+    Generator that applies filter_batch to each columnar batch.
+    Batches left empty are skipped.
+    """
+    for batch in batches:
+        batch = filter_batch(batch, predicate, projection)
+        if user_rows.batch_length(batch):
+            yield batch
+
+# --- Sinks ---
+def print_sink(batch):
+    """
+    Prints every row of a columnar batch as a dictionary.
+    Returns False once stdout is gone (e.g. piped into 'head') so the
+    pipeline stops instead of raising.
+    """
+    try:
+        for user in user_rows.iter_dicts(batch):
+            print(user)
+    except OSError as e:
+        # This takes care of errno 22 (Invalid argument) or 32 (Broken pipe) on windows or Linux respectivel
+        if e.errno == 22 or e.errno == 32:
+            return False
+        raise   # Other OSError.
+    return True
+
+def resume_offset(checkpoint_path):
+    """
+    Returns the sink offset saved by batch_processing at 'checkpoint_path',
+    to be passed as the sink's 'resume_at', or None when starting afresh.
+    """
+    return load_checkpoint(checkpoint_path, {}).get("offset")
+
+def batch_processing(batch_size, predicate=None, projection=None, sink=None, checkpoint_path=None):
+    """
+    Processes batches of users from 'stream_users_in_batches'.
+    Filters users over the age of 25 (or with any other 'predicate') and
+    keeps only the 'projection' columns if one is given. Work is done per
+    batch on columns rather than per user.
+    Each filtered batch is passed to 'sink' (e.g. print_sink); a sink that
+    returns False stops processing. Nothing is printed unless a sink is given.
+    Predicates with an SQL form are evaluated by the server instead, where
+    an (age, user_id) index (seed 'indexed'/'compact' profiles) serves them.
+    Returns the number of users that matched.
+
+    With 'checkpoint_path', the scan token and match count are saved there
+    after every batch the sink has taken, together with the sink's flushed
+    byte offset when it has a position() (see sinks.py). A later call with
+    the same path carries on after the last saved batch, and the count
+    includes earlier runs. Reopening a file sink with
+    resume_at=resume_offset(checkpoint_path) cuts off whatever was written
+    after the checkpoint, so every user lands in the file exactly once
+    (at least once for compressed files). Delete the checkpoint
+    (checkpoints.clear_checkpoint) to start over.
+    """
+    if predicate is None:
+        predicate = age_greater_than(25)
+
+    where = getattr(predicate, "sql", None)
+    if where is not None:
+        predicate = None    # Already applied by the server.
+
+    state = load_checkpoint(checkpoint_path, {}) if checkpoint_path else {}
+    matched = state.get("matched", 0)
+    batches = stream_users_in_batches(batch_size, row_format="columns", where=where,
+                                      resume_from=state.get("token"),
+                                      with_checkpoints=checkpoint_path is not None)
+    if checkpoint_path is None:
+        batches = ((batch, None) for batch in batches)
+    for batch, token in batches:
+        batch = filter_batch(batch, predicate, projection)
+        rows = user_rows.batch_length(batch)
+        if rows:
+            matched += rows
+            if sink is not None and sink(batch) is False:
+                break
+        if checkpoint_path is not None:
+            state = {"token": token, "matched": matched}
+            if hasattr(sink, "position"):
+                state["offset"] = sink.position()
+            save_checkpoint(checkpoint_path, state)
+    return matched
@@ -1,78 +1,289 @@
 from decimal import Decimal
 import mysql.connector
+import db_pool
 import sys
+import time
+import schema
+import user_rows
+from checkpoints import decode_token, encode_token
 
 # --- Database Configuration ---
-DB_HOST = "localhost"
-DB_USER = "alx_user"
-DB_PASSWORD = "user_password"
+# Host, user, password and pooling are configured in db_pool.
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
 
-def paginate_users(page_size, offset):
+# Columns keyset pagination may sort on. 'user_id' is the primary key and is
+# always appended as a tie-breaker so that non-unique columns (e.g. 'age')
+# still give a total order. Each needs an index leading with it for the seek
+# to stay cheap: the primary key, UNIQUE(email) and (age, user_id) from the
+# "indexed"/"compact" profiles (see seed.SCHEMA_PROFILES). 'name' has no
+# index, so it is not offered.
+SORT_COLUMNS = ("user_id", "email", "age")
+
+# Reconnect policy used when the server drops a long-lived pagination connection.
+RECONNECT_ATTEMPTS = 3
+RECONNECT_DELAY = 1     # seconds
+
+def connect_db():
     """
-    Fetches a single page of users from the database.
-    Returns a list of user dictionaries for the given page size and offset.
-    Returns an empty list if no moare users are found.
+    Opens a connection to the ALX_prodev database.
+    Returns the connection object, or None if the server is unreachable.
     """
-    connection = None
+    try:
+        connection = db_pool.connect(DB_NAME)
+        if connection.is_connected():
+            return connection
+    except mysql.connector.Error as e:
+        print(f"Database error while connecting: {e}", file=sys.stderr)
+    print(f"Error: Could not connect to database '{DB_NAME}'. Please check connection detials .", file=sys.stderr)
+    return None
+
+def fetch_page(select_query, params, connection=None, timings=None):
+    """
+    Runs a single page query and returns (column_names, rows), where rows
+    are the raw tuples from the cursor.
+    A connection that is passed in is reused and left open; otherwise one is
+    opened and closed just for this page. If the server has dropped a reused
+    connection, it is reconnected once and the query is retried.
+    When 'timings' is a list, a dict with the page's 'connect', 'query' and
+    'fetch' durations (in seconds) is appended to it.
+    select_query may contain '{columns}' and '{user_id}' fields; they are
+    filled in with the user column list and the user_id placeholder for the
+    table's layout (see schema).
+    Returns ((), []) on database errors.
+    """
+    own_connection = connection is None
     cursor = None
-    users_on_page = []
+    timing = {"connect": 0.0, "query": 0.0, "fetch": 0.0}
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
-        if not connection.is_connected():
-            print(f"Error: Could not connect to database '{DB_NAME}'. Please check connection detials .", file=sys.stderr)
-            return []   # Returns an empty lists.
-        
-        cursor = connection.cursor(dictionary=True, buffered=True)
-        
-        # Placeholders are used to safely pass page_size and offset args.
-        select_query = f"SELECT * FROM user_data LIMIT %s OFFSET %s"
-        cursor.execute(select_query, (page_size, offset))
-        
-        # All the results for this specific page.
-        users_on_page = cursor.fetchall()
-        
-        # Decimal convertion for 'age' to int for each user in the fetched page.
-        for user in users_on_page:
-            if 'age' in user and isinstance(user['age'], Decimal):
-                user['age'] = int(user['age'])
-        
-        return users_on_page
-    
+        if own_connection:
+            start = time.perf_counter()
+            connection = connect_db()
+            timing["connect"] = time.perf_counter() - start
+            if connection is None:
+                return (), []
+
+        for attempt in range(2):
+            try:
+                start = time.perf_counter()
+                layout = schema.describe(connection)
+                select_query = select_query.format(columns=schema.select_list(layout),
+                                                   user_id=schema.user_id_placeholder(layout))
+                cursor = connection.cursor()
+                cursor.execute(select_query, params)
+                timing["query"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                rows = cursor.fetchall()
+                timing["fetch"] = time.perf_counter() - start
+                break
+            except (mysql.connector.OperationalError, mysql.connector.InterfaceError) as e:
+                if attempt:
+                    raise
+                print(f"Connection lost ({e}), reconnecting...", file=sys.stderr)
+                cursor = None   # The old cursor died with the connection.
+                start = time.perf_counter()
+                connection.reconnect(attempts=RECONNECT_ATTEMPTS, delay=RECONNECT_DELAY)
+                timing["connect"] += time.perf_counter() - start
+
+        if timings is not None:
+            timings.append(timing)
+        return cursor.column_names, rows
+
     except mysql.connector.Error as e:
         print(f"Database error during page fetching: {e}", file=sys.stderr)
-        return []   # empty list on DB error
-    except Exception as e:
-        print(f"An unexpected error occured in paginate_users: {e}", file=sys.stderr)
-        return []   # General error.
+        return (), []   # empty page on DB error
     finally:
         if cursor:
-            cursor.close()  # Ensures cursor closure
-        if connection and connection.is_connected():
-            connection.close();
-            
-def lazy_pagination(page_size):
+            cursor.close()
+        if own_connection and connection and connection.leased:
+            connection.close()
+
+def paginate_users(page_size, offset, connection=None, timings=None, row_format="dict"):
+    """
+    Fetches a single page of users from the database.
+    Returns a list of user dictionaries for the given page size and offset.
+    Returns an empty list if no moare users are found.
+    An open 'connection' is reused instead of connecting again (see fetch_page).
+    row_format selects the page representation (see user_rows).
+    """
+    user_rows.validate_row_format(row_format)
+    # Placeholders are used to safely pass page_size and offset args.
+    # Without ORDER BY the row order may change between queries, so an offset
+    # (or a saved resume token) could skip or repeat rows.
+    select_query = "SELECT {columns} FROM user_data ORDER BY user_data.user_id LIMIT %s OFFSET %s"
+    columns, rows = fetch_page(select_query, (page_size, offset), connection, timings)
+
+    # Decimal convertion for 'age' to int happens once for the whole page.
+    return user_rows.convert_batch(rows, row_format, columns)
+
+# --- Keyset (seek) pagination ---
+def encode_cursor(sort_column, last_value, last_user_id):
+    """
+    Builds an opaque, URL-safe cursor token pointing just past the given row.
+    The token records the sort column so it cannot be replayed against a
+    different ordering.
+    """
+    if isinstance(last_value, Decimal):
+        last_value = str(last_value)
+    return encode_token({"c": sort_column, "v": last_value, "id": last_user_id})
+
+def decode_cursor(token, sort_column):
+    """
+    Decodes a cursor token produced by encode_cursor.
+    Returns a (last_value, last_user_id) tuple.
+    Raises ValueError if the token is malformed or was made for another sort column.
+    """
+    try:
+        payload = decode_token(token)
+        column, last_value, last_user_id = payload["c"], payload["v"], payload["id"]
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"Invalid pagination cursor: {e}") from None
+    if column != sort_column:
+        raise ValueError(f"Cursor was issued for sort column '{column}', not '{sort_column}'.")
+    return last_value, last_user_id
+
+def paginate_users_keyset(page_size, cursor_token=None, sort_column="user_id",
+                          connection=None, timings=None, row_format="dict"):
+    """
+    Fetches a single page of users that sort strictly after cursor_token.
+    Instead of skipping 'offset' rows, the query seeks straight to the last
+    row seen through the index on sort_column, so every page costs the same
+    as the first one.
+    Returns a (users, next_cursor) tuple; next_cursor is None on the last page.
+    """
+    if sort_column not in SORT_COLUMNS:
+        raise ValueError(f"sort_column must be one of {SORT_COLUMNS}.")
+    user_rows.validate_row_format(row_format)
+
+    if sort_column == "user_id":
+        order_by = f"{TABLE_NAME}.user_id"
+        seek_clause = "WHERE user_id > {user_id}"
+    else:
+        order_by = f"{TABLE_NAME}.{sort_column}, {TABLE_NAME}.user_id"
+        seek_clause = f"WHERE ({sort_column}, user_id) > (%s, {{user_id}})"
+
+    params = ()
+    where = ""
+    if cursor_token is not None:
+        last_value, last_user_id = decode_cursor(cursor_token, sort_column)
+        where = seek_clause
+        params = (last_user_id,) if sort_column == "user_id" else (last_value, last_user_id)
+
+    select_query = f"SELECT {{columns}} FROM {TABLE_NAME} {where} ORDER BY {order_by} LIMIT %s"
+    columns, rows = fetch_page(select_query, params + (page_size,), connection, timings)
+
+    next_cursor = None
+    if len(rows) == page_size:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_column, last[columns.index(sort_column)],
+                                    last[columns.index("user_id")])
+
+    # Conversion happens after the cursor is built so the token keeps the exact DB value.
+    return user_rows.convert_batch(rows, row_format, columns), next_cursor
+
+def open_session(connection):
+    """
+    Returns (connection, owned, connect_seconds) for a whole pagination run.
+    Opens a new connection only when none is given.
+    """
+    if connection is not None:
+        return connection, False, 0.0
+    start = time.perf_counter()
+    connection = connect_db()
+    return connection, True, time.perf_counter() - start
+
+def lazy_keyset_pagination(page_size, cursor_token=None, sort_column="user_id",
+                           connection=None, timings=None, row_format="dict"):
+    """
+    Generator that lazily loads pages of users using keyset pagination.
+    Yields (page, next_cursor) tuples. Persisting next_cursor lets a later
+    call resume from exactly that point by passing it back as cursor_token.
+    One connection (the given one, e.g. leased from a pool, or a new one) is
+    held for the whole run instead of connecting once per page.
+    """
+    if not isinstance(page_size, int) or page_size <= 0:
+        raise ValueError("page_size must be a positive integer.")
+
+    connection, owned, connect_time = open_session(connection)
+    if connection is None:
+        return
+    try:
+        while True:
+            page, cursor_token = paginate_users_keyset(page_size, cursor_token, sort_column,
+                                                       connection, timings, row_format)
+            if timings and connect_time:
+                timings[-1]["connect"] += connect_time  # Only the first page pays for connecting.
+                connect_time = 0.0
+            if not user_rows.batch_length(page):
+                break
+            yield page, cursor_token
+            if cursor_token is None:
+                break   # Short page: nothing left after it.
+    finally:
+        if owned and connection.leased:
+            connection.close()
+
+def lazy_pagination(page_size, mode="offset", cursor_token=None, sort_column="user_id",
+                    connection=None, timings=None, row_format="dict",
+                    resume_from=None, with_checkpoints=False):
     """
     Generator function that lazily loads pages of users from the database.
     It fetches the next page only when requested, using paginate_users function internally.
     This function uses only one loop
     Yields a list of user dictinaries for each page.
+
+    mode="keyset" switches to seek pagination (see lazy_keyset_pagination),
+    which keeps deep pages as cheap as the first one. cursor_token and
+    sort_column only apply in keyset mode.
+
+    A single connection is held for the life of the generator. Pass
+    'connection' to use one leased from elsewhere (it is left open), and a
+    list as 'timings' to collect per-page connect/query/fetch durations.
+    row_format="tuple" or "columns" yields compact pages (see user_rows).
+
+    with_checkpoints=True yields (page, token) tuples instead, where
+    'token' resumes right after that page when passed back as
+    'resume_from' (in the same mode); it is None after the last page.
+    Saving the token once a page has been handled gives at-least-once
+    processing across restarts.
     """
     if not isinstance(page_size, int) or page_size <= 0:
         raise ValueError("page_size must be a positive integer.")
-    
+
+    if mode == "keyset":
+        if resume_from is not None:
+            cursor_token = resume_from
+        pages = lazy_keyset_pagination(page_size, cursor_token, sort_column,
+                                       connection, timings, row_format)
+        yield from (pages if with_checkpoints else (page for page, _ in pages))
+        return
+    if mode != "offset":
+        raise ValueError("mode must be 'offset' or 'keyset'.")
+
     offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        
-        if not page:
-            break   # Exit generator loop if page is empty
-        
-        yield page  # yield the entire page
-        offset += page_size
\ No newline at end of file
+    if resume_from is not None:
+        offset = decode_token(resume_from, kind="offset")["o"]
+
+    connection, owned, connect_time = open_session(connection)
+    if connection is None:
+        return
+    try:
+        while True:
+            page = paginate_users(page_size, offset, connection, timings, row_format)
+            if timings and connect_time:
+                timings[-1]["connect"] += connect_time  # Only the first page pays for connecting.
+                connect_time = 0.0
+
+            if not user_rows.batch_length(page):
+                break   # Exit generator loop if page is empty
+
+            offset += page_size
+            if with_checkpoints:
+                full = user_rows.batch_length(page) == page_size
+                yield page, (encode_token({"k": "offset", "o": offset}) if full else None)
+            else:
+                yield page  # yield the entire page
+    finally:
+        if owned and connection.leased:
+            connection.close()
@@ -3,7 +3,13 @@ import sys
 processing = __import__('1-batch_processing')
 
 ##### print processed users in a batch of 50
+##### (or write them to a file: ./2-main.py users.ndjson.gz, see sinks.py)
 try:
-    processing.batch_processing(50)
+    if len(sys.argv) > 1:
+        import sinks
+        with sinks.open_sink(sys.argv[1]) as sink:
+            processing.batch_processing(50, sink=sink)
+    else:
+        processing.batch_processing(50, sink=processing.print_sink)
 except BrokenPipeError:
     sys.stderr.close()
\ No newline at end of file
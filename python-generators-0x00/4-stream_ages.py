@@ -1,73 +1,215 @@
 from decimal import Decimal
-from operator import truediv
+from itertools import chain
+import math
 import mysql.connector
+import db_pool
 import sys
+import schema
+import sketches
+from change_feed import read_changes
+from accumulators import RunningStats, TDigest
 
 # --- Database Configuration ---
-DB_HOST = "localhost"
-DB_USER = "alx_user"
-DB_PASSWORD = "user_password"
+# Host, user, password and pooling are configured in db_pool.
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
 
-def stream_user_ages():
+# Aggregates aggregate_ages understands; all of them map onto SQL functions.
+STATS = ("avg", "count", "sum", "min", "max")
+AGE_WINDOW_SIZE = 1000  # Ages read per fetch when streaming.
+
+def stream_user_ages(predicate=None, exact=False):
     """
     Generator function that yields user ages one by one directly from the database.
     This ensures memory efficiencey as the entire age list not loaded at once.
+    With a 'predicate' (a callable taking a user dictionary), whole rows are
+    read and only the ages of users it accepts are yielded.
+    DECIMAL ages are truncated to ints, unless exact=True, in which case
+    they are yielded as floats (what the SQL aggregates see).
+    Rows are read from an unbuffered cursor AGE_WINDOW_SIZE at a time, so
+    at most one window is held in memory whatever the table size.
     """
     connection = None
     cursor = None
+    exhausted = False
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        connection = db_pool.connect(DB_NAME)
         if not connection.is_connected():
             print(f"Error: Could not connect to database '{DB_NAME}'. Please check connection detials .", file=sys.stderr)
             return   # Generator simply stops if it cannot proceed.
         
-        cursor = connection.cursor(dictionary=True, buffered=True)
+        cursor = connection.cursor(dictionary=True)
         
         # Select only the 'age' column to minimize data fetched per row
         select_query = f"SELECT age FROM {TABLE_NAME}"
+        if predicate is not None:
+            select_query = f"SELECT {schema.select_list(schema.describe(connection))} FROM {TABLE_NAME}"
         cursor.execute(select_query)
         
-        #   Loops iterates directly over the cursor results.
-        for row in cursor:
+        rows = chain.from_iterable(iter(lambda: cursor.fetchmany(AGE_WINDOW_SIZE), []))
+        if predicate is not None:
+            rows = filter(predicate, rows)
+        for row in rows:
             age = row.get('age')
             if age is not None:
                 if isinstance(age, Decimal):
-                    age = int(age)
+                    age = float(age) if exact else int(age)
                 yield age
+        exhausted = True
     except mysql.connector.Error as e:
         print(f"Database error in stream_user_ages: {e}", file=sys.stderr)
     except Exception as e:
         print(f"An unexpected error occured in stream_user_ages: {e} ", file=sys.stderr)
     finally:
-        # closes database resources.
+        if cursor and not exhausted:
+            # Unread rows are still on the wire; drop the socket instead of
+            # reading them all (see 0-stream_users).
+            connection.shutdown()
+        else:
+            # closes database resources.
+            if cursor:
+                cursor.close()
+            if connection and connection.leased:
+                connection.close()
+
+def percentile_key(percentile):
+    """
+    Result key for a percentile, e.g. 50 -> 'p50', 99.9 -> 'p99.9'.
+    """
+    return f"p{percentile:g}"
+
+def aggregate_ages_sql(stats=STATS, percentiles=()):
+    """
+    Computes the requested aggregates on the server, so only the results
+    cross the wire. When 'age' leads an index (see schema.describe),
+    percentiles use the nearest-rank method: one 'ORDER BY age LIMIT 1
+    OFFSET k' lookup each, answered from the index without a sort. Without
+    one they are t-digest estimates from a single streamed pass over age.
+    Returns a dictionary of results, or None on database errors.
+    """
+    connection = None
+    cursor = None
+    try:
+        connection = db_pool.connect(DB_NAME)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(age), SUM(age), AVG(age), MIN(age), MAX(age) FROM {TABLE_NAME}")
+        count, total, average, minimum, maximum = cursor.fetchone()
+        everything = {"count": count, "sum": total, "avg": average, "min": minimum, "max": maximum}
+        results = {stat: (float(value) if isinstance(value, Decimal) else value)
+                   for stat, value in everything.items() if stat in stats}
+
+        if percentiles and count and not schema.describe(connection)["age_index"]:
+            # Without an index on age every lookup below would sort the whole
+            # table, so all percentiles are estimated from one streamed pass.
+            digest = TDigest()
+            cursor.execute(f"SELECT age FROM {TABLE_NAME}")
+            for window in iter(lambda: cursor.fetchmany(AGE_WINDOW_SIZE), []):
+                digest.update(float(age) for (age,) in window)
+            results.update((percentile_key(p), digest.quantile(p / 100)) for p in percentiles)
+            return results
+
+        for percentile in percentiles:
+            value = None
+            if count:
+                rank = max(math.ceil(percentile / 100 * count), 1)
+                cursor.execute(f"SELECT age FROM {TABLE_NAME} ORDER BY age LIMIT 1 OFFSET %s", (rank - 1,))
+                value = float(cursor.fetchone()[0])
+            results[percentile_key(percentile)] = value
+        return results
+    except mysql.connector.Error as e:
+        print(f"Database error in aggregate_ages_sql: {e}", file=sys.stderr)
+        return None
+    finally:
         if cursor:
             cursor.close()
-        if connection and connection.is_connected():
+        if connection and connection.leased:
             connection.close()
 
-def calculate_average_age():
+def aggregate_ages_streaming(stats=STATS, percentiles=(), predicate=None, compression=100):
+    """
+    Computes the requested aggregates in a single pass over stream_user_ages,
+    for cases the server cannot evaluate (a Python 'predicate').
+    Mean and sums use RunningStats; percentiles are t-digest estimates.
+    Ages are not truncated, so the results match aggregate_ages_sql.
+    """
+    running = RunningStats()
+    digest = TDigest(compression) if percentiles else None
+    for age in stream_user_ages(predicate, exact=True):
+        running.add(age)
+        if digest is not None:
+            digest.add(age)
+
+    everything = {"count": running.count, "sum": running.total if running.count else None,
+                  "avg": running.mean, "min": running.minimum, "max": running.maximum}
+    results = {stat: value for stat, value in everything.items() if stat in stats}
+    for percentile in percentiles:
+        results[percentile_key(percentile)] = digest.quantile(percentile / 100)
+    return results
+
+def aggregate_ages(stats=("avg",), percentiles=(), predicate=None):
+    """
+    Aggregates user ages: any of 'avg', 'count', 'sum', 'min', 'max', plus
+    percentiles given on a 0-100 scale (results keyed 'p50', 'p99', ...).
+    Without a predicate the work is pushed down to SQL; with one, ages are
+    streamed and folded in a numerically stable single pass.
+    Returns a dictionary of results (None where there are no ages).
+    """
+    unknown = set(stats) - set(STATS)
+    if unknown:
+        raise ValueError(f"Unsupported stats {sorted(unknown)}; choose from {STATS}.")
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("percentiles must be between 0 and 100.")
+
+    if predicate is None:
+        results = aggregate_ages_sql(stats, percentiles)
+        if results is not None:
+            return results
+        print("Falling back to streaming aggregation.", file=sys.stderr)
+    return aggregate_ages_streaming(stats, percentiles, predicate)
+
+def update_sketches(sketch_path=sketches.SKETCH_PATH, batch_size=1000):
+    """
+    Adds the rows changed since the sketches at 'sketch_path' were last
+    updated (read from the change feed) and saves them. Missing sketches,
+    or sketches without a change-feed mark, are rebuilt from every row.
+    Returns the UserSketches.
     """
-    Calculates the average age of users by consuming ages one by one
-    from the stream_user_age generator function, ensuring memory efficiencey.
+    current = sketches.load_sketches(sketch_path)
+    if current is None or current.mark is None:
+        current = sketches.UserSketches()
+    for batch, mark in read_changes(current.mark, batch_size, row_format="columns"):
+        current.update(batch["email"], batch["age"])
+        current.mark = mark
+    sketches.save_sketches(current, sketch_path)
+    return current
+
+def approximate_age_stats(sketch_path=sketches.SKETCH_PATH, confidence=sketches.DEFAULT_CONFIDENCE):
+    """
+    Answers average age, rows per age bucket and distinct emails from the
+    stored sketches, without touching the database. Each figure carries
+    'low'/'high' bounds at its 'confidence' (see UserSketches.estimates).
+    Returns None if no sketches have been built yet.
+    """
+    current = sketches.load_sketches(sketch_path)
+    if current is None:
+        print(f"No sketches found at '{sketch_path}'; run update_sketches() first.", file=sys.stderr)
+        return None
+    return current.estimates(confidence)
+
+def calculate_average_age(predicate=None, approximate=False, sketch_path=sketches.SKETCH_PATH):
+    """
+    Calculates the average age of users.
+    The average is computed by the server (SQL AVG) unless a 'predicate' is
+    given, in which case ages are consumed one by one from stream_user_ages.
+    With approximate=True (and no predicate) it is estimated from the sketches (see
+    approximate_age_stats), falling back to the exact average if there are none.
     Returns the calculated average age.
-    
-    """
-    total_age = 0
-    count_users = 0
-    
-    for age in stream_user_ages():
-        total_age += age
-        count_users += 1
-        
-    if count_users == 0:
+    """
+    if approximate and predicate is None:
+        stats = approximate_age_stats(sketch_path)
+        if stats is not None and stats["avg_age"]["estimate"] is not None:
+            return stats["avg_age"]["estimate"]
+    average = aggregate_ages(("avg",), predicate=predicate)["avg"]
+    if average is None:
         return 0.0  # Returns 0.0 as the average age.
-    
-    average = total_age / count_users
-    return average
\ No newline at end of file
+    return average
@@ -0,0 +1,168 @@
+"""
+Single-pass accumulators for aggregating streamed values.
+
+RunningStats keeps count, sum, min, max, mean and variance using Welford's
+algorithm, which stays numerically stable over millions of values. TDigest
+is a small merging t-digest that estimates quantiles in bounded memory.
+Both can be merged, so partial results from separate scans can be combined.
+"""
+
+import math
+
+
+class RunningStats:
+    """
+    Streaming count/sum/min/max/mean/variance (Welford's algorithm).
+    """
+    __slots__ = ("count", "total", "minimum", "maximum", "_mean", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """
+        Folds another RunningStats into this one (Chan et al. pairwise update).
+        """
+        if not other.count:
+            return self
+        if not self.count:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return self
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def mean(self):
+        return self._mean if self.count else None
+
+    @property
+    def variance(self):
+        """Sample variance, or None with fewer than two values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+
+class TDigest:
+    """
+    Merging t-digest for approximate quantiles.
+
+    Values are buffered and periodically merged into at most roughly
+    'compression' centroids. Centroids near the tails are kept small, so
+    extreme quantiles (p99, p99.9) stay accurate.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or compression * 5
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self._centroids = []    # Sorted (mean, weight) pairs.
+        self._buffer = []
+
+    def add(self, value, weight=1):
+        self._buffer.append((value, weight))
+        self.count += weight
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if len(self._buffer) >= self.buffer_size:
+            self._compress()
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        for mean, weight in other._centroids + other._buffer:
+            self.add(mean, weight)
+        # Centroid means lie inside the range; keep other's exact extremes.
+        if other.minimum is not None and other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if other.maximum is not None and other.maximum > self.maximum:
+            self.maximum = other.maximum
+        return self
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        merged = []
+        cumulative = 0
+        mean, weight = points[0]
+        for next_mean, next_weight in points[1:]:
+            q = (cumulative + weight + next_weight / 2) / self.count
+            limit = 4 * self.count * q * (1 - q) / self.compression
+            if weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append((mean, weight))
+                cumulative += weight
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self._centroids = merged
+
+    def quantile(self, q):
+        """
+        Returns the estimated value at quantile q (0 <= q <= 1), or None if empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1.")
+        self._compress()
+        if not self._centroids:
+            return None
+        target = q * self.count
+        # Centroid centres sit at cumulative weight + half their own weight;
+        # interpolate between neighbouring centres (and min/max at the ends).
+        previous_mean, previous_position = self.minimum, 0
+        cumulative = 0
+        for mean, weight in self._centroids:
+            position = cumulative + weight / 2
+            if target <= position:
+                span = position - previous_position
+                if span <= 0:
+                    return mean
+                return previous_mean + (mean - previous_mean) * (target - previous_position) / span
+            previous_mean, previous_position = mean, position
+            cumulative += weight
+        span = self.count - previous_position
+        if span <= 0:
+            return self.maximum
+        return previous_mean + (self.maximum - previous_mean) * (target - previous_position) / span
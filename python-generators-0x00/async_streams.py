@@ -0,0 +1,184 @@
+"""
+Asyncio counterparts of the user_data generators, built on aiomysql.
+
+Every generator here is an async generator that overlaps I/O with work:
+as soon as a batch arrives, the fetch for the next one is started in the
+background, so the database round trip runs while the consumer is still
+processing the current batch.
+
+Each generator takes an optional 'connection'. Anything with aiomysql's
+connection interface works, which makes a local stand-in easy to plug in
+for tests. When no connection is given, one is opened for the scan and
+closed afterwards.
+"""
+
+import asyncio
+import sys
+from contextlib import aclosing, suppress
+import aiomysql
+import db_pool
+import schema
+import user_rows
+
+# --- Database Configuration ---
+# Host, user and password are shared with db_pool (aiomysql connections are not pooled there).
+DB_NAME = "ALX_prodev"
+TABLE_NAME = "user_data"
+
+DEFAULT_WINDOW_SIZE = 1000
+
+async def connect_async():
+    """
+    Opens an aiomysql connection to the ALX_prodev database.
+    """
+    return await aiomysql.connect(
+        host=db_pool.DB_HOST,
+        user=db_pool.DB_USER,
+        password=db_pool.DB_PASSWORD,
+        db=DB_NAME
+    )
+
+async def prefetch_batches(fetch, cancel_pending=True):
+    """
+    Async generator over the batches returned by awaiting fetch() until it
+    returns an empty batch. The next fetch is always in flight while the
+    consumer works on the current batch.
+
+    When the generator is closed early, the fetch still in flight is
+    cancelled (or, with cancel_pending=False, allowed to finish) and awaited,
+    so nothing is reading from the cursor once aclose() returns. Callers
+    must close it before closing their cursor or connection, e.g. with
+    contextlib.aclosing().
+    """
+    pending = asyncio.ensure_future(fetch())
+    try:
+        while True:
+            batch = await pending
+            if not user_rows.batch_length(batch):
+                return
+            pending = asyncio.ensure_future(fetch())
+            yield batch
+    finally:
+        if not pending.done():
+            if cancel_pending:
+                pending.cancel()
+            with suppress(asyncio.CancelledError, aiomysql.Error):
+                await pending
+
+async def scan_batches(select_query, params, batch_size, row_format, connection=None):
+    """
+    Async generator that runs one query on an unbuffered (server-side)
+    cursor and yields converted batches of batch_size rows. A '{columns}'
+    field in select_query is filled in with the user columns for the
+    table's layout (see schema), as in the synchronous generators.
+    """
+    owned = connection is None
+    cursor = None
+    finished = False
+    try:
+        if owned:
+            connection = await connect_async()
+        layout = await schema.describe_async(connection)
+        cursor = await connection.cursor(aiomysql.SSCursor)
+        await cursor.execute(select_query.format(columns=schema.select_list(layout)), params)
+        columns = [description[0] for description in cursor.description]
+
+        async def fetch():
+            return user_rows.convert_batch(await cursor.fetchmany(batch_size), row_format, columns)
+
+        # A cancelled read leaves the protocol mid-packet, which is only
+        # acceptable when the connection is ours and gets dropped anyway.
+        async with aclosing(prefetch_batches(fetch, cancel_pending=owned)) as batches:
+            async for batch in batches:
+                yield batch
+        finished = True
+    except aiomysql.Error as e:
+        print(f"Database error during async streaming: {e}", file=sys.stderr)
+    finally:
+        if owned and connection is not None:
+            if finished:
+                await connection.ensure_closed()
+            else:
+                connection.close()  # Dropping the socket skips draining unread rows.
+        elif cursor is not None:
+            # A borrowed connection must be left usable, so unread rows are drained.
+            await cursor.close()
+
+async def stream_users_async(window_size=DEFAULT_WINDOW_SIZE, row_format="dict", connection=None):
+    """
+    Async generator yielding users one by one (dicts or UserRow tuples),
+    reading them window_size rows at a time.
+    """
+    if not isinstance(window_size, int) or window_size <= 0:
+        raise ValueError("window_size must be a positive integer.")
+    if row_format not in ("dict", "tuple"):
+        raise ValueError("stream_users_async yields single rows; row_format must be 'dict' or 'tuple'.")
+    select_query = f"SELECT {{columns}} FROM {TABLE_NAME}"
+    async with aclosing(scan_batches(select_query, (), window_size, row_format, connection)) as batches:
+        async for batch in batches:
+            for row in batch:
+                yield row
+
+async def stream_users_in_batches_async(batch_size, row_format="dict", connection=None):
+    """
+    Async generator yielding batches of batch_size users.
+    """
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+    user_rows.validate_row_format(row_format)
+    select_query = f"SELECT {{columns}} FROM {TABLE_NAME}"
+    async with aclosing(scan_batches(select_query, (), batch_size, row_format, connection)) as batches:
+        async for batch in batches:
+            yield batch
+
+async def lazy_pagination_async(page_size, row_format="dict", connection=None):
+    """
+    Async generator yielding pages of users. Pages are fetched with keyset
+    pagination on user_id, and the next page is requested as soon as the
+    current one arrives.
+    """
+    if not isinstance(page_size, int) or page_size <= 0:
+        raise ValueError("page_size must be a positive integer.")
+    user_rows.validate_row_format(row_format)
+
+    owned = connection is None
+    last_user_id = None
+    try:
+        if owned:
+            connection = await connect_async()
+        layout = await schema.describe_async(connection)
+        select_columns = schema.select_list(layout)
+
+        async def fetch():
+            nonlocal last_user_id
+            where, params = "", (page_size,)
+            if last_user_id is not None:
+                where = f"WHERE user_id > {schema.user_id_placeholder(layout)}"
+                params = (last_user_id, page_size)
+            async with connection.cursor() as cursor:
+                await cursor.execute(f"SELECT {select_columns} FROM {TABLE_NAME} "
+                                     f"{where} ORDER BY {TABLE_NAME}.user_id LIMIT %s", params)
+                rows = await cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+            if rows:
+                last_user_id = rows[-1][0]
+            return user_rows.convert_batch(list(rows), row_format, columns)
+
+        async with aclosing(prefetch_batches(fetch, cancel_pending=owned)) as pages:
+            async for page in pages:
+                yield page
+    except aiomysql.Error as e:
+        print(f"Database error during async page fetching: {e}", file=sys.stderr)
+    finally:
+        if owned and connection is not None:
+            connection.close()
+
+async def stream_user_ages_async(connection=None):
+    """
+    Async generator yielding user ages one by one as ints.
+    """
+    select_query = f"SELECT age FROM {TABLE_NAME}"
+    async with aclosing(scan_batches(select_query, (), DEFAULT_WINDOW_SIZE, "columns", connection)) as batches:
+        async for batch in batches:
+            for age in batch["age"]:
+                yield age
@@ -0,0 +1,113 @@
+"""
+Adaptive batch sizing for stream_users_in_batches.
+
+A fixed batch size is either too small (one round trip for a handful of
+rows) or too large (a huge batch held in memory at once). AdaptiveBatchSizer
+measures every fetch (time taken and bytes per row) and picks the next size
+so that one batch takes about 'target_seconds' to fetch and stays under
+'memory_budget' bytes, within [min_size, max_size].
+
+    sizer = AdaptiveBatchSizer(target_seconds=0.05, memory_budget=4 << 20)
+    for batch in stream_users_in_batches(500, sizer=sizer):
+        ...
+    print(sizer.metrics())
+"""
+
+import sys
+from collections import deque
+
+SAMPLE_ROWS = 16        # Rows per batch measured for the per-row size estimate.
+SMOOTHING = 0.3         # Weight of the newest measurement in the moving averages.
+MAX_GROWTH = 2.0        # A batch is at most this many times larger than the last.
+
+
+def row_bytes(rows, sample=SAMPLE_ROWS):
+    """
+    Estimates the in-memory size of one row from the first 'sample' rows
+    (tuples or dictionaries as returned by the cursor).
+    """
+    rows = rows[:sample]
+    if not rows:
+        return 0
+    total = 0
+    for row in rows:
+        values = row.values() if isinstance(row, dict) else row
+        total += sys.getsizeof(row) + sum(map(sys.getsizeof, values))
+    return total / len(rows)
+
+
+class AdaptiveBatchSizer:
+    """
+    Chooses batch sizes from measured fetch latency and row size.
+    """
+
+    def __init__(self, target_seconds=0.05, memory_budget=8 << 20, min_size=10,
+                 max_size=100000, initial_size=None, history=256):
+        if not 0 < min_size <= max_size:
+            raise ValueError("min_size and max_size must satisfy 0 < min_size <= max_size.")
+        if target_seconds <= 0 or memory_budget <= 0:
+            raise ValueError("target_seconds and memory_budget must be positive.")
+        self.target_seconds = target_seconds
+        self.memory_budget = memory_budget
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = self._clamp(initial_size or min_size)
+        self.limited_by = None
+        self.history = deque(maxlen=history)  # (requested, rows, seconds, bytes_per_row)
+        self._seconds_per_row = None
+        self._bytes_per_row = None
+        self._batches = 0
+        self._rows = 0
+        self._seconds = 0.0
+
+    def _clamp(self, size):
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def _average(self, previous, value):
+        return value if previous is None else previous + SMOOTHING * (value - previous)
+
+    def record(self, rows, seconds, bytes_per_row):
+        """
+        Feeds back one fetch of 'rows' rows and picks the next size.
+        """
+        self.history.append((self.size, rows, seconds, bytes_per_row))
+        self._batches += 1
+        self._rows += rows
+        self._seconds += seconds
+        if not rows:
+            return self.size
+        self._seconds_per_row = self._average(self._seconds_per_row, seconds / rows)
+        self._bytes_per_row = self._average(self._bytes_per_row, bytes_per_row)
+
+        limits = {"memory": self.memory_budget / max(self._bytes_per_row, 1)}
+        if self._seconds_per_row > 0:
+            limits["latency"] = self.target_seconds / self._seconds_per_row
+        self.limited_by = min(limits, key=limits.get)
+        wanted = limits[self.limited_by]
+        if wanted > self.size * MAX_GROWTH:
+            wanted, self.limited_by = self.size * MAX_GROWTH, "growth"
+        size = self._clamp(wanted)
+        if size != int(wanted):
+            self.limited_by = "bounds"
+        self.size = size
+        return size
+
+    def metrics(self):
+        """
+        Returns the current size, why it was chosen ('latency', 'memory',
+        'growth' or 'bounds'), the smoothed per-row cost and totals, plus
+        min/max/mean of the sizes used so far.
+        """
+        sizes = [requested for requested, _, _, _ in self.history]
+        return {
+            "size": self.size,
+            "limited_by": self.limited_by,
+            "batches": self._batches,
+            "rows": self._rows,
+            "fetch_seconds": self._seconds,
+            "seconds_per_row": self._seconds_per_row,
+            "bytes_per_row": self._bytes_per_row,
+            "min_size_used": min(sizes, default=None),
+            "max_size_used": max(sizes, default=None),
+            "mean_size_used": sum(sizes) / len(sizes) if sizes else None,
+        }
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+"""
+Compares offset and keyset pagination from 2-lazy_paginate.py.
+
+The benchmark seeds a throwaway database (ALX_prodev_bench) with synthetic
+users at each scale, then times a single page fetched at the start, the
+middle and the end of the table in both modes. A full pass is only timed
+where offset mode can finish in reasonable time.
+
+Usage: python3 bench_pagination.py [rows ...]    (default: 1000 100000 10000000)
+"""
+import sys
+import time
+import uuid
+import db_pool
+
+lazy = __import__('2-lazy_paginate')
+
+BENCH_DB_NAME = "ALX_prodev_bench"
+PAGE_SIZE = 100
+FULL_PASS_LIMIT = 100000    # Offset mode is O(n^2) over a full pass.
+INSERT_CHUNK = 10000
+
+def prepare_table(target_rows):
+    """
+    Creates the bench database and tops user_data up to target_rows synthetic rows.
+    """
+    connection = db_pool.connect()
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {BENCH_DB_NAME}")
+    cursor.close()
+    connection.close()
+
+    connection = db_pool.connect(BENCH_DB_NAME)
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {lazy.TABLE_NAME} (
+            user_id VARCHAR(40) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            age DECIMAL(5, 2) NOT NULL
+        )
+    """)
+    cursor.execute(f"SELECT COUNT(*) FROM {lazy.TABLE_NAME}")
+    existing = cursor.fetchone()[0]
+
+    insert_query = f"INSERT INTO {lazy.TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+    for start in range(existing, target_rows, INSERT_CHUNK):
+        stop = min(start + INSERT_CHUNK, target_rows)
+        rows = [(str(uuid.uuid4()), f"User {i}", f"user{i}@bench.example", 18 + i % 80)
+                for i in range(start, stop)]
+        cursor.executemany(insert_query, rows)
+        connection.commit()
+    cursor.close()
+    connection.close()
+
+def cursor_at(offset):
+    """
+    Returns a keyset cursor token that resumes at the given offset.
+    Setup work only, so it is not included in the timings.
+    """
+    if offset == 0:
+        return None
+    connection = db_pool.connect(BENCH_DB_NAME)
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT user_id FROM {lazy.TABLE_NAME} ORDER BY user_id LIMIT 1 OFFSET %s", (offset - 1,))
+    last_user_id = cursor.fetchone()[0]
+    cursor.close()
+    connection.close()
+    return lazy.encode_cursor("user_id", last_user_id, last_user_id)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def run(scale):
+    prepare_table(scale)
+    print(f"\n--- {scale} rows (page_size={PAGE_SIZE}) ---")
+    print(f"{'depth':>12} {'offset (ms)':>12} {'keyset (ms)':>12}")
+    for depth in (0, scale // 2, max(scale - PAGE_SIZE, 0)):
+        offset_time = timed(lazy.paginate_users, PAGE_SIZE, depth)
+        keyset_time = timed(lazy.paginate_users_keyset, PAGE_SIZE, cursor_at(depth))
+        print(f"{depth:>12} {offset_time * 1000:>12.2f} {keyset_time * 1000:>12.2f}")
+
+    if scale <= FULL_PASS_LIMIT:
+        for mode in ("offset", "keyset"):
+            elapsed = timed(lambda: sum(1 for _ in lazy.lazy_pagination(PAGE_SIZE, mode=mode)))
+            print(f"full pass, {mode:<6}: {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    scales = [int(arg) for arg in sys.argv[1:]] or [1000, 100000, 10000000]
+    lazy.DB_NAME = BENCH_DB_NAME
+    for scale in sorted(scales):
+        run(scale)
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+"""
+Shows how read_ahead (1-batch_processing.py) overlaps fetching with work.
+
+A stand-in for the database sleeps 'db_ms' per batch and the consumer
+sleeps 'consumer_ms' per batch. Without read-ahead the two add up; with it
+the total approaches max(db_ms, consumer_ms) per batch.
+
+Usage: python3 bench_prefetch.py [batches] [db_ms] [consumer_ms]   (default: 50 20 20)
+"""
+import sys
+import time
+
+batching = __import__('1-batch_processing')
+
+def slow_database(batches, db_delay):
+    for number in range(batches):
+        time.sleep(db_delay)
+        yield [number]
+
+def consume(batches, consumer_delay):
+    start = time.perf_counter()
+    for _ in batches:
+        time.sleep(consumer_delay)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    batches, db_ms, consumer_ms = (args + [50, 20, 20][len(args):])[:3]
+    db_delay, consumer_delay = db_ms / 1000, consumer_ms / 1000
+
+    print(f"{batches} batches, database {db_ms} ms/batch, consumer {consumer_ms} ms/batch")
+    print(f"ideal sequential: {batches * (db_delay + consumer_delay):.2f}s, "
+          f"ideal overlapped: {batches * max(db_delay, consumer_delay) + min(db_delay, consumer_delay):.2f}s")
+    elapsed = consume(slow_database(batches, db_delay), consumer_delay)
+    print(f"{'no read-ahead':<16} {elapsed:.2f}s")
+    for depth in (1, 2, 4, 8):
+        elapsed = consume(batching.read_ahead(slow_database(batches, db_delay), depth), consumer_delay)
+        print(f"{'depth ' + str(depth):<16} {elapsed:.2f}s")
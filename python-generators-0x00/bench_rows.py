@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+"""
+Compares the row representations in user_rows ("dict", "tuple", "columns").
+
+Each representation runs in its own child process so that peak RSS is not
+shared between runs. All converted rows are kept alive until the end of a
+run, which makes the per-row footprint of each representation visible; the
+garbage collector is paused while they pile up.
+
+Usage:
+    python3 bench_rows.py [batch_size]                  # reads user_data from MySQL
+    python3 bench_rows.py --synthetic ROWS [batch_size] # no database needed
+"""
+import gc
+import multiprocessing
+import resource
+import sys
+import time
+import uuid
+from decimal import Decimal
+import user_rows
+
+batching = __import__('1-batch_processing')
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def synthetic_batches(total_rows, batch_size):
+    """
+    Builds raw cursor-style tuples up front so only conversion is timed.
+    """
+    rows = [(str(uuid.uuid4()), f"User {i}", f"user{i}@bench.example", Decimal(18 + i % 80))
+            for i in range(total_rows)]
+    return [rows[i:i + batch_size] for i in range(0, total_rows, batch_size)]
+
+def run(row_format, batch_size, synthetic_rows, results):
+    # Retained rows would otherwise turn rows/s into a measure of the cyclic GC.
+    gc.disable()
+    kept = []
+    row_count = 0
+    if synthetic_rows:
+        raw_batches = synthetic_batches(synthetic_rows, batch_size)
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        for raw in raw_batches:
+            batch = user_rows.convert_batch(raw, row_format)
+            row_count += user_rows.batch_length(batch)
+            kept.append(batch)
+    else:
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        for batch in batching.stream_users_in_batches(batch_size, row_format=row_format):
+            row_count += user_rows.batch_length(batch)
+            kept.append(batch)
+    elapsed = time.perf_counter() - start
+    results[row_format] = (row_count, elapsed, peak_rss_mb() - baseline)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    synthetic_rows = 0
+    if args and args[0] == "--synthetic":
+        synthetic_rows = int(args[1])
+        args = args[2:]
+    batch_size = int(args[0]) if args else 1000
+
+    results = multiprocessing.Manager().dict()
+    for row_format in user_rows.ROW_FORMATS:
+        worker = multiprocessing.Process(target=run, args=(row_format, batch_size, synthetic_rows, results))
+        worker.start()
+        worker.join()
+
+    print(f"{'format':<8} {'rows':>10} {'rows/s':>12} {'peak RSS +MB':>14}")
+    for row_format in user_rows.ROW_FORMATS:
+        if row_format not in results:
+            print(f"{row_format:<8} failed")
+            continue
+        row_count, elapsed, rss = results[row_format]
+        rate = row_count / elapsed if elapsed else 0.0
+        print(f"{row_format:<8} {row_count:>10} {rate:>12.0f} {rss:>14.1f}")
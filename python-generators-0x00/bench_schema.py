@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+"""
+Compares the seed.SCHEMA_PROFILES table layouts on the same data.
+
+For each profile a throwaway database (ALX_prodev_<profile>) is seeded
+through seed.py from one generated CSV, then the same workloads are timed
+against it: a full scan (stream_users_in_batches), an age filter
+(batch_processing, pushed down to the server), AVG/MIN/MAX and percentile
+lookups (aggregate_ages_sql). Table and index sizes come from
+INFORMATION_SCHEMA.
+
+Usage: python3 bench_schema.py [rows] [profile ...]   (default: 100000, every profile)
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import seed
+
+batching = __import__('1-batch_processing')
+ages = __import__('4-stream_ages')
+
+BATCH_SIZE = 1000
+PERCENTILES = (50, 90, 99)
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL)
+        writer.writerow(seed.CSV_COLUMNS)
+        for i in range(rows):
+            writer.writerow((f"User {i}", f"user{i}@bench.example", 18 + i * 7 % 80))
+
+def use_database(name):
+    seed.DB_NAME = batching.DB_NAME = ages.DB_NAME = name
+
+def prepare(profile, csv_path):
+    """
+    Creates ALX_prodev_<profile> with the given profile and seeds it.
+    """
+    use_database(f"ALX_prodev_{profile}")
+    connection = seed.connect_db()
+    seed.create_database(connection)
+    connection.close()
+    connection = seed.connect_to_prodev()
+    seed.create_table(connection, profile)
+    seed.insert_data(connection, csv_path, checkpoint_path=csv_path + f".{profile}.checkpoint")
+    connection.close()
+
+def table_size():
+    """
+    Returns (data_bytes, index_bytes) for user_data after refreshing statistics.
+    """
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    cursor.execute(f"ANALYZE TABLE {seed.TABLE_NAME}")
+    cursor.fetchall()
+    cursor.execute("SELECT DATA_LENGTH, INDEX_LENGTH FROM INFORMATION_SCHEMA.TABLES "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (seed.TABLE_NAME,))
+    sizes = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return sizes
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def full_scan():
+    for _ in batching.stream_users_in_batches(BATCH_SIZE, row_format="columns"):
+        pass
+
+def run(profile, csv_path):
+    prepare(profile, csv_path)
+    data_bytes, index_bytes = table_size()
+    return {
+        "data MB": data_bytes / 2**20,
+        "index MB": index_bytes / 2**20,
+        "scan s": timed(full_scan),
+        "age>25 s": timed(batching.batch_processing, BATCH_SIZE),
+        "avg/min/max s": timed(ages.aggregate_ages_sql, ("avg", "min", "max")),
+        "percentiles s": timed(ages.aggregate_ages_sql, (), PERCENTILES),
+    }
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    profiles = sys.argv[2:] or list(seed.SCHEMA_PROFILES)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "users.csv")
+        write_csv(csv_path, rows)
+        results = {profile: run(profile, csv_path) for profile in profiles}
+
+    print(f"\n--- {rows} rows ---")
+    metrics = list(next(iter(results.values())))
+    print(f"{'profile':<10}" + "".join(f"{metric:>15}" for metric in metrics))
+    for profile, result in results.items():
+        print(f"{profile:<10}" + "".join(f"{result[metric]:>15.3f}" for metric in metrics))
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""
+Compares print_sink with the file sinks in sinks.py on synthetic batches.
+
+print_sink writes to /dev/null so terminal speed does not count. Each file
+sink writes into a temporary directory; the table shows rows/s and the
+size of the resulting file.
+
+Usage: python3 bench_sinks.py [rows] [batch_size]   (default: 500000 1000)
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+import sinks
+import user_rows
+
+batching = __import__('1-batch_processing')
+
+TARGETS = ("users.ndjson", "users.ndjson.gz", "users.csv", "users.csv.gz", "users.ucol", "users.ucol.gz")
+
+def synthetic_batches(total_rows, batch_size):
+    rows = [(str(uuid.uuid4()), f"User {i}", f"user{i}@bench.example", Decimal(18 + i % 80))
+            for i in range(total_rows)]
+    return [user_rows.convert_batch(rows[i:i + batch_size], "columns")
+            for i in range(0, total_rows, batch_size)]
+
+def timed(sink, batches):
+    start = time.perf_counter()
+    for batch in batches:
+        sink(batch)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    total_rows, batch_size = (args + [500000, 1000][len(args):])[:2]
+    batches = synthetic_batches(total_rows, batch_size)
+
+    print(f"{'sink':<18} {'rows/s':>12} {'size (MB)':>10}")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        elapsed = timed(batching.print_sink, batches)
+    print(f"{'print_sink':<18} {total_rows / elapsed:>12,.0f} {'-':>10}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for target in TARGETS:
+            path = os.path.join(workdir, target)
+            sink = sinks.open_sink(path)
+            start = time.perf_counter()
+            with sink:
+                timed(sink, batches)
+            elapsed = time.perf_counter() - start
+            print(f"{target:<18} {total_rows / elapsed:>12,.0f} {os.path.getsize(path) / 2**20:>10.1f}")
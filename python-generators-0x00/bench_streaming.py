@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+"""
+Checks the memory ceiling of stream_users with and without streaming=True.
+
+The benchmark tops a throwaway database (ALX_prodev_stream_bench) up to the
+given number of synthetic users, then scans it in a fresh child process per
+mode, dropping each row as soon as it is read, and reports rows/s and peak
+RSS growth. A last run reads a few rows in streaming mode and closes the
+generator early, which must not drain the rest of the result set.
+
+The exit status is 1 when the streaming scan grows peak RSS past
+--ceiling-mb, so the check can gate a CI job.
+
+Usage: python3 bench_streaming.py [--rows N] [--window W] [--ceiling-mb MB]
+       (default: 2000000 rows, window 1000, ceiling 64 MB)
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from itertools import islice
+import db_pool
+import seed
+
+stream = __import__('0-stream_users')
+
+BENCH_DB_NAME = "ALX_prodev_stream_bench"
+INSERT_CHUNK = 10000
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def prepare_table(target_rows):
+    """
+    Creates the bench database and tops user_data up to target_rows synthetic rows.
+    """
+    connection = db_pool.connect()
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {BENCH_DB_NAME}")
+    cursor.close()
+    connection.close()
+
+    connection = db_pool.connect(BENCH_DB_NAME)
+    seed.create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {stream.TABLE_NAME}")
+    existing = cursor.fetchone()[0]
+
+    insert_query = f"INSERT INTO {stream.TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+    for start in range(existing, target_rows, INSERT_CHUNK):
+        stop = min(start + INSERT_CHUNK, target_rows)
+        rows = [(f"bench-{i:012d}", f"User {i}", f"user{i}@stream.bench", 18 + i % 80)
+                for i in range(start, stop)]
+        cursor.executemany(insert_query, rows)
+        connection.commit()
+    cursor.close()
+    connection.close()
+
+def run(mode, window_size, results):
+    stream.DB_NAME = BENCH_DB_NAME
+    streaming = mode != "buffered"
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    users = stream.stream_users(streaming=streaming, window_size=window_size)
+    if mode == "early-close":
+        row_count = sum(1 for _ in islice(users, window_size // 2))
+        users.close()
+    else:
+        row_count = sum(1 for _ in users)
+    elapsed = time.perf_counter() - start
+    results[mode] = (row_count, elapsed, peak_rss_mb() - baseline)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory ceiling of buffered vs streaming stream_users.")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--window", type=int, default=stream.DEFAULT_WINDOW_SIZE)
+    parser.add_argument("--ceiling-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    prepare_table(args.rows)
+    modes = ("buffered", "streaming", "early-close")
+    results = multiprocessing.Manager().dict()
+    for mode in modes:
+        worker = multiprocessing.Process(target=run, args=(mode, args.window, results))
+        worker.start()
+        worker.join()
+
+    print(f"{'mode':<12} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak RSS +MB':>14}")
+    for mode in modes:
+        if mode not in results:
+            print(f"{mode:<12} failed")
+            continue
+        row_count, elapsed, rss = results[mode]
+        rate = row_count / elapsed if elapsed else 0.0
+        print(f"{mode:<12} {row_count:>10} {elapsed:>9.2f} {rate:>12.0f} {rss:>14.1f}")
+
+    if "streaming" not in results or results["streaming"][2] > args.ceiling_mb:
+        print(f"FAIL: streaming scan exceeded the {args.ceiling_mb:g} MB ceiling.", file=sys.stderr)
+        sys.exit(1)
+    print(f"OK: streaming scan stayed under {args.ceiling_mb:g} MB.")
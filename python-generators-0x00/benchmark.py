@@ -0,0 +1,269 @@
+#!/usr/bin/python3
+"""
+Benchmark harness for the generators pipeline.
+
+For every scale, a throwaway database (<database>_<rows>) is seeded through
+seed.py from a generated CSV, then each workload runs in its own child
+process:
+  stream_users            rows one by one (0-stream_users.py)
+  batch_processing        age > 25 filter over columnar batches (1-batch_processing.py)
+  lazy_pagination         offset and keyset pages (2-lazy_paginate.py)
+  calculate_average_age   SQL AVG and the streamed single pass (4-stream_ages.py)
+Each run records rows/s, p50/p99 latency between consecutive batches
+(rows, for stream_users), the peak RSS growth of the child, the
+connections it opened through db_pool and the server's 'Connections'
+counter delta. Results are written as JSON together with the git commit,
+so two runs can be compared:
+
+    python3 benchmark.py --scales 1000 100000 --output before.json
+    python3 benchmark.py --compare before.json after.json
+
+Point ALX_DB_HOST / ALX_DB_USER / ALX_DB_PASSWORD (see db_pool.py) at a
+disposable MySQL or MariaDB server; the bench databases are left in place
+so later runs skip seeding.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import db_pool
+import seed
+
+stream = __import__('0-stream_users')
+batching = __import__('1-batch_processing')
+lazy = __import__('2-lazy_paginate')
+ages = __import__('4-stream_ages')
+
+DEFAULT_SCALES = (1000, 100000)
+DEFAULT_DATABASE = "ALX_prodev_benchmark"
+BATCH_SIZE = 1000
+PAGE_SIZE = 1000
+
+def use_database(name):
+    for module in (seed, stream, batching, lazy, ages):
+        module.DB_NAME = name
+
+def git_commit():
+    """
+    Returns (commit hash, dirty flag) for the working tree, or (None, None).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL)
+        writer.writerow(seed.CSV_COLUMNS)
+        for i in range(rows):
+            writer.writerow((f"User {i}", f"user{i}@bench.example", 18 + i * 7 % 80))
+
+def prepare(rows, workdir):
+    """
+    Creates and seeds the bench database for 'rows' rows (a no-op once seeded).
+    """
+    connection = seed.connect_db()
+    if connection is None:
+        sys.exit("Cannot reach the MySQL server; check the ALX_DB_* settings.")
+    seed.create_database(connection)
+    connection.close()
+    connection = seed.connect_to_prodev()
+    seed.create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {seed.TABLE_NAME}")
+    existing = cursor.fetchone()[0]
+    cursor.close()
+    if existing < rows:
+        csv_path = os.path.join(workdir, f"users_{rows}.csv")
+        write_csv(csv_path, rows)
+        seed.insert_data(connection, csv_path, checkpoint_path=csv_path + ".checkpoint")
+    connection.close()
+
+def server_info():
+    connection = db_pool.connect()
+    cursor = connection.cursor()
+    cursor.execute("SELECT VERSION()")
+    version = cursor.fetchone()[0]
+    cursor.close()
+    connection.close()
+    return version
+
+def server_connections():
+    """
+    The server's total 'Connections' counter (connection attempts since start).
+    """
+    connection = db_pool.connect()
+    cursor = connection.cursor()
+    cursor.execute("SHOW GLOBAL STATUS LIKE 'Connections'")
+    count = int(cursor.fetchone()[1])
+    cursor.close()
+    connection.close()
+    return count
+
+def percentile_ms(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)] * 1000
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def timed_items(items, count):
+    """
+    Consumes 'items', timing the wait for each one. 'count' gives the rows
+    in an item. Returns (rows, [latency seconds]).
+    """
+    rows, latencies = 0, []
+    previous = time.perf_counter()
+    for item in items:
+        now = time.perf_counter()
+        latencies.append(now - previous)
+        rows += count(item)
+        previous = time.perf_counter()
+    return rows, latencies
+
+def run_stream_users():
+    return timed_items(stream.stream_users(streaming=True), lambda row: 1)
+
+def run_batch_processing():
+    latencies = []
+    previous = [time.perf_counter()]
+    def sink(batch):
+        now = time.perf_counter()
+        latencies.append(now - previous[0])
+        previous[0] = now
+        return True
+    # Every row is scanned; only the matches reach the sink.
+    batching.batch_processing(BATCH_SIZE, sink=sink)
+    return None, latencies
+
+def run_lazy_pagination(mode):
+    pages = lazy.lazy_pagination(PAGE_SIZE, mode=mode, row_format="columns")
+    return timed_items(pages, lambda page: len(page["user_id"]))
+
+def run_average_age(streamed):
+    start = time.perf_counter()
+    ages.calculate_average_age(predicate=(lambda user: True) if streamed else None)
+    return None, [time.perf_counter() - start]
+
+WORKLOADS = {
+    "stream_users": run_stream_users,
+    "batch_processing": run_batch_processing,
+    "lazy_pagination_offset": lambda: run_lazy_pagination("offset"),
+    "lazy_pagination_keyset": lambda: run_lazy_pagination("keyset"),
+    "calculate_average_age_sql": lambda: run_average_age(False),
+    "calculate_average_age_streamed": lambda: run_average_age(True),
+}
+
+def run_child(workload, database, results):
+    use_database(database)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    rows, latencies = WORKLOADS[workload]()
+    elapsed = time.perf_counter() - start
+    opened = sum(metrics["opened"] for metrics in db_pool.pool_metrics().values())
+    results[workload] = (rows, elapsed, latencies, peak_rss_mb() - baseline, opened)
+
+def measure(workload, database, scale):
+    before = server_connections()
+    with multiprocessing.Manager() as manager:
+        results = manager.dict()
+        child = multiprocessing.Process(target=run_child, args=(workload, database, results))
+        child.start()
+        child.join()
+        if workload not in results:
+            return {"error": f"child exited with code {child.exitcode}"}
+        rows, elapsed, latencies, rss_mb, opened = results[workload]
+    rows = scale if rows is None else rows  # Workloads that scan the table without yielding rows.
+    latencies = sorted(latencies)
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else None,
+        "batches": len(latencies),
+        "p50_batch_ms": percentile_ms(latencies, 0.50),
+        "p99_batch_ms": percentile_ms(latencies, 0.99),
+        "peak_rss_mb": rss_mb,
+        "pool_connections_opened": opened,
+        "server_connections": server_connections() - before,
+    }
+
+def run(scales, database, workloads):
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": server_info(),
+        "batch_size": BATCH_SIZE,
+        "page_size": PAGE_SIZE,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in sorted(scales):
+            name = f"{database}_{scale}"
+            use_database(name)
+            prepare(scale, workdir)
+            report["scales"][str(scale)] = scale_results = {}
+            for workload in workloads:
+                print(f"{scale:>10} rows  {workload:<32}", end="", flush=True)
+                scale_results[workload] = result = measure(workload, name, scale)
+                if "error" in result:
+                    print(result["error"])
+                else:
+                    print(f"{result['rows_per_second']:>14,.0f} rows/s  "
+                          f"p99 {result['p99_batch_ms'] or 0:.2f} ms")
+    return report
+
+def compare(old_path, new_path):
+    """
+    Prints rows/s and p99 changes between two result files.
+    """
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    print(f"{(old['commit'] or '?')[:10]} -> {(new['commit'] or '?')[:10]}")
+    print(f"{'scale':>10} {'workload':<32} {'rows/s':>10} {'p99':>10}")
+    for scale, workloads in new["scales"].items():
+        for workload, result in workloads.items():
+            before = old["scales"].get(scale, {}).get(workload)
+            if not before or "error" in before or "error" in result:
+                continue
+            speed = result["rows_per_second"] / before["rows_per_second"] - 1
+            p99 = result["p99_batch_ms"] / before["p99_batch_ms"] - 1 if before["p99_batch_ms"] else 0.0
+            print(f"{scale:>10} {workload:<32} {speed:>+10.1%} {p99:>+10.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the user_data generators.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES))
+    parser.add_argument("--database", default=DEFAULT_DATABASE,
+                        help="prefix of the throwaway databases (default: %(default)s)")
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--output", help="result file (default: benchmark-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    report = run(args.scales, args.database, args.workloads)
+    output = args.output or f"benchmark-{(report['commit'] or 'unknown')[:10]}.json"
+    with open(output, "w") as result_file:
+        json.dump(report, result_file, indent=2)
+    print(f"Results written to {output}")
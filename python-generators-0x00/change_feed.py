@@ -0,0 +1,142 @@
+"""
+Incremental change feed over user_data.
+
+Rows carry an 'updated_at' timestamp that the server sets on every INSERT
+and UPDATE (see seed.create_table / seed.ensure_change_tracking). The feed
+reads rows in (updated_at, user_id) order past a saved high-water mark, so
+each run only sees what changed since the previous one. Deletes are not
+captured.
+
+A row's updated_at is stamped when its statement runs, not when it
+commits, so a writer transaction that is still open can later commit rows
+stamped in the past. Each run therefore stops short of the oldest open
+writer transaction (from information_schema.innodb_trx, which needs the
+PROCESS privilege). Without that privilege it stops max_transaction_seconds
+before now; set that above the longest writer transaction (seed.py commits
+every COMMIT_EVERY chunks), or rows can be skipped for good.
+
+Settings come from the environment, with these defaults:
+  ALX_FEED_SETTLE_SECONDS            1    rows newer than this wait for the next run
+  ALX_FEED_MAX_TRANSACTION_SECONDS   600  fallback when innodb_trx cannot be read
+"""
+
+import os
+import sys
+import mysql.connector
+import db_pool
+import schema
+import user_rows
+from checkpoints import load_checkpoint, save_checkpoint
+
+# --- Database Configuration ---
+# Host, user, password and pooling are configured in db_pool.
+DB_NAME = "ALX_prodev"
+TABLE_NAME = "user_data"
+
+DEFAULT_BATCH_SIZE = 1000
+SETTLE_SECONDS = float(os.environ.get("ALX_FEED_SETTLE_SECONDS", 1))
+MAX_TRANSACTION_SECONDS = float(os.environ.get("ALX_FEED_MAX_TRANSACTION_SECONDS", 600))
+
+def upper_bound(cursor, settle_seconds=SETTLE_SECONDS, max_transaction_seconds=MAX_TRANSACTION_SECONDS):
+    """
+    Latest updated_at a run may read up to without a later commit landing
+    behind its mark: settle_seconds before now, and before the start of the
+    oldest other transaction that has modified rows. If innodb_trx cannot
+    be read, max_transaction_seconds before now.
+    """
+    cursor.execute("SELECT NOW(6) - INTERVAL %s SECOND", (settle_seconds,))
+    bound = cursor.fetchone()[0]
+    try:
+        cursor.execute(
+            "SELECT MIN(trx_started) - INTERVAL 1 MICROSECOND FROM information_schema.innodb_trx "
+            "WHERE trx_rows_modified > 0 AND trx_mysql_thread_id <> CONNECTION_ID()"
+        )
+        oldest = cursor.fetchone()[0]
+    except mysql.connector.Error as e:
+        print(f"Cannot read open transactions ({e}); holding back {max_transaction_seconds}s.",
+              file=sys.stderr)
+        cursor.execute("SELECT NOW(6) - INTERVAL %s SECOND", (max(settle_seconds, max_transaction_seconds),))
+        return cursor.fetchone()[0]
+    return bound if oldest is None else min(bound, oldest)
+
+def read_changes(since=None, batch_size=DEFAULT_BATCH_SIZE, row_format="dict",
+                 settle_seconds=SETTLE_SECONDS, max_transaction_seconds=MAX_TRANSACTION_SECONDS):
+    """
+    Generator yielding (batch, mark) tuples for rows changed after 'since'.
+    'since' and 'mark' are {"updated_at": str, "user_id": str} dictionaries;
+    'mark' points at the last row of its batch. since=None reads everything.
+    Rows past upper_bound() are left for a later run.
+    """
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+    user_rows.validate_row_format(row_format)
+
+    connection = None
+    cursor = None
+    try:
+        connection = db_pool.connect(DB_NAME)
+        layout = schema.describe(connection)
+        columns = schema.select_list(layout, schema.USER_COLUMNS + ("updated_at",))
+        cursor = connection.cursor()
+        bound = upper_bound(cursor, settle_seconds, max_transaction_seconds)
+
+        mark = since
+        while True:
+            where, params = "updated_at <= %s", (bound,)
+            if mark is not None:
+                where += f" AND (updated_at, user_id) > (%s, {schema.user_id_placeholder(layout)})"
+                params += (mark["updated_at"], mark["user_id"])
+            cursor.execute(
+                f"SELECT {columns} FROM {TABLE_NAME} "
+                f"WHERE {where} ORDER BY updated_at, {TABLE_NAME}.user_id LIMIT %s",
+                params + (batch_size,)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last = rows[-1]
+            mark = {"updated_at": last[4].isoformat(sep=" "), "user_id": last[0]}
+            yield user_rows.convert_batch(rows, row_format, cursor.column_names), mark
+            if len(rows) < batch_size:
+                break
+    except mysql.connector.Error as e:
+        print(f"Database error while reading changes: {e}", file=sys.stderr)
+    finally:
+        if cursor:
+            cursor.close()
+        if connection and connection.leased:
+            connection.close()
+
+def latest_mark(connection):
+    """
+    Returns the mark of the most recently changed row (what read_changes
+    would end on), or None for an empty table.
+    """
+    layout = schema.describe(connection)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"SELECT updated_at, {schema.column_expression(layout, 'user_id')} FROM {TABLE_NAME} "
+            f"ORDER BY updated_at DESC, {TABLE_NAME}.user_id DESC LIMIT 1"
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    return {"updated_at": row[0].isoformat(sep=" "), "user_id": row[1]}
+
+def stream_user_changes(checkpoint_path, batch_size=DEFAULT_BATCH_SIZE, row_format="dict",
+                        settle_seconds=SETTLE_SECONDS, max_transaction_seconds=MAX_TRANSACTION_SECONDS):
+    """
+    Generator yielding batches of users inserted or updated since the
+    checkpoint stored at 'checkpoint_path' (everything on the first run).
+    The checkpoint advances once the consumer asks for the next batch, i.e.
+    after it has finished with the previous one. A run that dies mid-batch
+    sees that batch again next time (at-least-once delivery).
+    """
+    since = load_checkpoint(checkpoint_path)
+    for batch, mark in read_changes(since, batch_size, row_format, settle_seconds,
+                                    max_transaction_seconds):
+        yield batch
+        save_checkpoint(checkpoint_path, mark)
@@ -0,0 +1,68 @@
+"""
+Small helpers for persisting scan checkpoints as JSON files.
+
+Checkpoints are written to a temporary file and moved into place, so a
+crash mid-write never leaves a truncated checkpoint behind.
+
+Scans also hand out resume tokens: opaque, URL-safe strings wrapping a
+small JSON payload (e.g. the last user_id and batch number) that can be
+stored anywhere and passed back to the generator as 'resume_from'.
+"""
+
+import base64
+import json
+import os
+
+
+def load_checkpoint(path, default=None):
+    """
+    Returns the checkpoint stored at 'path', or 'default' if there is none.
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return default
+
+def save_checkpoint(path, checkpoint):
+    """
+    Atomically stores a JSON-serialisable checkpoint at 'path'.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, mode='w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def encode_token(payload):
+    """
+    Wraps a JSON-serialisable dictionary into an opaque resume token.
+    """
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+def decode_token(token, kind=None):
+    """
+    Returns the dictionary inside a token made by encode_token.
+    If 'kind' is given, the token's "k" entry must match it.
+    Raises ValueError for malformed tokens or tokens of another kind.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid resume token: {e}") from None
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid resume token: not an object.")
+    if kind is not None and payload.get("k") != kind:
+        raise ValueError(f"Resume token is for a '{payload.get('k')}' scan, not '{kind}'.")
+    return payload
+
+def clear_checkpoint(path):
+    """
+    Removes the checkpoint at 'path' if there is one.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,153 @@
+"""
+Streaming CSV reader for large seed files.
+
+Records are parsed by the C csv parser straight into field lists and
+handed out in chunks of tuples; no dict is built per row. Field counts
+and typed columns are checked and converted once per chunk, a column at
+a time. Only one chunk is held in memory, however large the file.
+
+The file is read through a large fixed-size buffer. With use_mmap=True it
+is memory-mapped instead and cut into blocks at line breaks that lie
+outside quoted fields, so a quoted field may still contain commas,
+escaped quotes or newlines.
+"""
+
+import csv
+import io
+import mmap
+import os
+from itertools import chain, islice
+from operator import itemgetter
+
+DEFAULT_BUFFER_SIZE = 4 << 20   # 4 MiB
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def mapped_chunks(file, buffer_size):
+    """
+    Yields successive byte strings of buffer_size bytes from a memory map of 'file'.
+    """
+    if not os.fstat(file.fileno()).st_size:
+        return  # Empty files cannot be mapped.
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        for start in range(0, len(mapped), buffer_size):
+            yield mapped[start:start + buffer_size]
+
+def iter_blocks(path, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Generator yielding decoded text blocks of a memory-mapped 'path', each
+    ending on a record boundary: a newline preceded by an even number of
+    quote characters (escaped quotes come in pairs, so they keep the parity).
+    """
+    encoding = "utf-8-sig"    # Drops a byte order mark from the first block.
+    pending = b""
+    with open(path, "rb", buffering=0) as file:
+        for data in mapped_chunks(file, buffer_size):
+            data = pending + data if pending else data
+            end = data.rfind(b"\n")
+            while end != -1 and data.count(b'"', 0, end) % 2:
+                end = data.rfind(b"\n", 0, end)    # That newline is inside a quoted field.
+            if end == -1:
+                pending = data
+                continue
+            pending = data[end + 1:]
+            yield data[:end + 1].decode(encoding)
+            encoding = "utf-8"
+    if pending:
+        yield pending.decode(encoding)
+
+def iter_fields(path, buffer_size=DEFAULT_BUFFER_SIZE, use_mmap=False):
+    """
+    Generator yielding the field list of every line of 'path', header included.
+    """
+    if use_mmap:
+        blocks = iter_blocks(path, buffer_size)
+        yield from chain.from_iterable(csv.reader(io.StringIO(block, newline="")) for block in blocks)
+        return
+    with open(path, newline="", encoding="utf-8-sig", buffering=buffer_size) as file:
+        yield from csv.reader(file)
+
+def check_widths(rows, width, first_record, path):
+    """
+    Returns (rows without blank lines, their record numbers). The numbers
+    are None when there were no blank lines (they then simply count up from
+    first_record). Raises ValueError naming the first record that does not
+    have 'width' fields.
+    """
+    numbers = None
+    widths = set(map(len, rows))
+    if 0 in widths:
+        numbers = [number for number, row in enumerate(rows, start=first_record) if row]
+        rows = list(filter(None, rows))
+        widths.discard(0)
+    if widths <= {width}:
+        return rows, numbers
+    for number, row in zip(numbers or range(first_record, first_record + len(rows)), rows):
+        if len(row) != width:
+            raise ValueError(f"{path}: record {number} has {len(row)} fields, expected {width}.")
+
+def convert_column(values, converter, column, numbers, path):
+    """
+    Applies 'converter' to a whole column, naming the first bad value (by
+    its record number in 'numbers') on failure.
+    """
+    try:
+        return list(map(converter, values))
+    except (ValueError, TypeError):
+        for number, value in zip(numbers, values):
+            try:
+                converter(value)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"{path}: record {number}, column '{column}': {e}") from None
+        raise
+
+def read_records(path, columns, converters=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 buffer_size=DEFAULT_BUFFER_SIZE, use_mmap=False, skip_rows=0):
+    """
+    Generator yielding lists of up to chunk_size tuples holding the named
+    'columns' (in that order) of every record after the header.
+    'converters' maps column names to callables applied to the whole column
+    of each chunk (e.g. {"age": float}). The first 'skip_rows' records are
+    skipped; blank lines are neither yielded nor counted. Malformed records
+    raise ValueError with their record number.
+    """
+    converters = converters or {}
+    records = iter_fields(path, buffer_size, use_mmap)
+    header = next(records, None)
+    if header is None:
+        return
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing} in header {header}.")
+    width = len(header)
+    getters = [itemgetter(header.index(column)) for column in columns]
+
+    # Skip in chunks. Blank lines are not counted, which matches the rows
+    # that are yielded (and so seed's resume checkpoint).
+    record = 1          # Number of the first record in the chunk (header excluded).
+    remaining = skip_rows
+    while remaining:
+        rows = list(islice(records, min(remaining, chunk_size)))
+        if not rows:
+            return
+        record += len(rows)
+        remaining -= len(rows) - rows.count([])
+    while True:
+        rows = list(islice(records, chunk_size))
+        if not rows:
+            return
+        first = record
+        record += len(rows)
+        rows, numbers = check_widths(rows, width, first, path)
+        if not rows:
+            continue
+        # Work column by column: one C-level map per column instead of
+        # Python code per row.
+        values = [list(map(getter, rows)) for getter in getters]
+        for index, column in enumerate(columns):
+            if column in converters:
+                values[index] = convert_column(values[index], converters[column], column,
+                                               numbers or range(first, record), path)
+        yield list(zip(*values))
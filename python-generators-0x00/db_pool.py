@@ -0,0 +1,318 @@
+"""
+Shared, thread-safe MySQL connection pool for the user_data generators.
+
+Every module gets its connections from here instead of calling
+mysql.connector.connect itself, so running several generators at once
+(threads in one worker) reuses a bounded set of connections rather than
+opening a new one per call. There is one pool per database (and per set
+of extra connect arguments), created on first use.
+
+Settings come from the environment, with these defaults:
+  ALX_DB_HOST / ALX_DB_USER / ALX_DB_PASSWORD   localhost / alx_user / user_password
+  ALX_DB_POOL_SIZE           5     connections per pool
+  ALX_DB_POOL_TIMEOUT        30    seconds to wait for a free connection
+  ALX_DB_POOL_MAX_LIFETIME   1800  seconds before a connection is replaced
+  ALX_DB_POOL_PING_AFTER     30    idle seconds after which it is pinged on borrow
+
+connect() returns a PooledConnection. Its close() hands the connection
+back to the pool ('leased' tells whether that has happened yet); shutdown() drops it (use it when unread rows are left on
+an unbuffered cursor). mysql.connector ships its own pooling, but it has no
+acquire timeout, lifetime limit or metrics, which is what this adds.
+"""
+
+import os
+import threading
+import time
+import mysql.connector
+
+DB_HOST = os.environ.get("ALX_DB_HOST", "localhost")
+DB_USER = os.environ.get("ALX_DB_USER", "alx_user")
+DB_PASSWORD = os.environ.get("ALX_DB_PASSWORD", "user_password")
+
+POOL_SIZE = int(os.environ.get("ALX_DB_POOL_SIZE", 5))
+ACQUIRE_TIMEOUT = float(os.environ.get("ALX_DB_POOL_TIMEOUT", 30))
+MAX_LIFETIME = float(os.environ.get("ALX_DB_POOL_MAX_LIFETIME", 1800))
+PING_AFTER = float(os.environ.get("ALX_DB_POOL_PING_AFTER", 30))
+
+
+class PoolTimeout(mysql.connector.errors.PoolError):
+    """
+    Raised when no connection becomes free within the acquire timeout.
+    Being a mysql.connector.Error, it is handled wherever database errors are.
+    """
+
+
+class PooledConnection:
+    """
+    A connection borrowed from a ConnectionPool. Everything except close()
+    and shutdown() is passed through to the underlying mysql.connector
+    connection.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise mysql.connector.errors.InterfaceError("Connection has been returned to the pool.")
+        return getattr(raw, name)
+
+    @property
+    def leased(self):
+        """
+        True until the connection is given back with close() or shutdown().
+        """
+        return self._raw is not None
+
+    def is_connected(self):
+        """
+        Asks the underlying connection whether the server is still reachable
+        (mysql.connector pings it). False once the connection is given back.
+        """
+        return self._raw is not None and self._raw.is_connected()
+
+    def close(self):
+        """
+        Returns the connection to the pool. Safe to call more than once.
+        """
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def shutdown(self):
+        """
+        Drops the socket without reading pending results and removes the
+        connection from the pool.
+        """
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections with health checks, a lifetime limit,
+    an acquire timeout and metrics (see metrics()).
+    """
+
+    def __init__(self, database=None, size=POOL_SIZE, acquire_timeout=ACQUIRE_TIMEOUT,
+                 max_lifetime=MAX_LIFETIME, ping_after=PING_AFTER, **connect_args):
+        if size <= 0:
+            raise ValueError("size must be a positive integer.")
+        self.database = database
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.connect_args = dict(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, **connect_args)
+        if database is not None:
+            self.connect_args["database"] = database
+
+        self._condition = threading.Condition()
+        self._idle = []         # (connection, created_at, returned_at); most recent last.
+        self._created = {}      # id(connection) -> created_at, for connections in use.
+        self._slots = 0         # Connections open or being opened.
+        self._in_use = 0
+        self._stats = {"acquired": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                       "opened": 0, "closed": 0, "expired": 0, "failed_pings": 0, "discarded": 0}
+
+    def _count(self, name, amount=1):
+        with self._condition:
+            self._stats[name] += amount
+
+    def _open(self):
+        connection = mysql.connector.connect(**self.connect_args)
+        self._count("opened")
+        return connection
+
+    def _close(self, connection):
+        self._count("closed")
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass    # Already gone; nothing left to release.
+
+    def _usable(self, connection, created_at, returned_at, now):
+        """
+        Checks an idle connection before handing it out. Called without the lock.
+        """
+        if now - created_at >= self.max_lifetime:
+            self._count("expired")
+            return False
+        if now - returned_at >= self.ping_after:
+            try:
+                connection.ping(reconnect=False)
+            except mysql.connector.Error:
+                self._count("failed_pings")
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Returns a PooledConnection, waiting up to 'timeout' seconds (default:
+        the pool's acquire_timeout) for one to become free.
+        Raises PoolTimeout if none does.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._slots >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No connection to '{self.database}' became free within {timeout}s "
+                            f"(pool size {self.size}).")
+                    self._condition.wait(remaining)
+                idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    self._slots += 1    # Reserve the slot before connecting outside the lock.
+
+            now = time.monotonic()
+            if idle is not None:
+                connection, created_at, returned_at = idle
+                if not self._usable(connection, created_at, returned_at, now):
+                    self._close(connection)
+                    with self._condition:
+                        self._slots -= 1
+                        self._condition.notify()
+                    continue    # Try the next idle connection, or open a new one.
+            else:
+                try:
+                    connection, created_at = self._open(), now
+                except BaseException:
+                    with self._condition:
+                        self._slots -= 1
+                        self._condition.notify()
+                    raise
+
+            waited = time.monotonic() - start
+            with self._condition:
+                self._in_use += 1
+                self._created[id(connection)] = created_at
+                self._stats["acquired"] += 1
+                self._stats["wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            return PooledConnection(self, connection)
+
+    def release(self, connection, discard=False):
+        """
+        Takes back a raw connection handed out by acquire(). It is closed
+        instead of kept when 'discard' is set or when it still has unread
+        results.
+        """
+        with self._condition:
+            created_at = self._created.pop(id(connection), time.monotonic())
+            self._in_use -= 1
+        keep = not discard
+        if keep:
+            try:
+                if connection.unread_result:
+                    keep = False
+                elif connection.in_transaction:
+                    connection.rollback()   # Don't leak an open transaction to the next borrower.
+            except mysql.connector.Error:
+                keep = False
+
+        if keep:
+            with self._condition:
+                self._idle.append((connection, created_at, time.monotonic()))
+                self._condition.notify()
+            return
+
+        self._count("discarded")
+        if discard:
+            try:
+                connection.shutdown()
+            except mysql.connector.Error:
+                pass
+            self._count("closed")
+        else:
+            self._close(connection)
+        with self._condition:
+            self._slots -= 1
+            self._condition.notify()
+
+    def close(self):
+        """
+        Closes every idle connection. Connections in use are closed when they
+        come back.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._slots -= len(idle)
+            self._condition.notify_all()
+        for connection, _, _ in idle:
+            self._close(connection)
+
+    def metrics(self):
+        """
+        Returns a snapshot of the pool's counters: in_use, idle, acquired,
+        timeouts, wait_seconds (total), avg_wait_seconds, max_wait_seconds,
+        and churn (opened, closed, expired, failed_pings, discarded).
+        """
+        with self._condition:
+            snapshot = dict(self._stats, size=self.size, in_use=self._in_use, idle=len(self._idle))
+        acquired = snapshot["acquired"]
+        snapshot["avg_wait_seconds"] = snapshot["wait_seconds"] / acquired if acquired else 0.0
+        return snapshot
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _forget_pools_after_fork():
+    # A forked child must not share the parent's sockets; it starts with
+    # empty pools and leaves the inherited connections alone.
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_pools_after_fork)
+
+def get_pool(database=None, **connect_args):
+    """
+    Returns the shared pool for 'database' (None: no default database) and
+    the given extra mysql.connector.connect arguments, creating it once.
+    """
+    key = (database, tuple(sorted(connect_args.items())))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(database, **connect_args)
+        return _pools[key]
+
+def connect(database=None, timeout=None, **connect_args):
+    """
+    Borrows a connection from the shared pool for 'database'. close() on
+    the returned connection gives it back.
+    """
+    return get_pool(database, **connect_args).acquire(timeout)
+
+def pool_metrics():
+    """
+    Returns {database: metrics} for every pool in this process.
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {(database if not extra else f"{database} {dict(extra)}"): pool.metrics()
+            for (database, extra), pool in pools}
+
+def close_all():
+    """
+    Closes the idle connections of every pool.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,130 @@
+"""
+Detects the layout of the user_data table so the generators can adapt to it.
+
+seed.create_table can build the table from one of several profiles (see
+seed.SCHEMA_PROFILES). The generators only need to know two things:
+  - whether user_id is stored as BINARY(16) rather than text, in which case
+    it is converted back to its usual text form in SELECT lists and seek
+    parameters are converted to binary;
+  - whether 'age' leads an index, so age filters and percentile lookups
+    can be answered from it (4-stream_ages only pushes percentiles down to
+    SQL when it does).
+The layout is looked up once per database and table and then cached.
+"""
+
+TABLE_NAME = "user_data"
+USER_COLUMNS = ("user_id", "name", "email", "age")
+
+# Portable BINARY(16) -> 'xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx' conversion
+# (BIN_TO_UUID only exists on MySQL 8).
+BINARY_UUID_TO_TEXT = ("LOWER(CONCAT_WS('-', HEX(SUBSTR({0}, 1, 4)), HEX(SUBSTR({0}, 5, 2)), "
+                       "HEX(SUBSTR({0}, 7, 2)), HEX(SUBSTR({0}, 9, 2)), HEX(SUBSTR({0}, 11, 6))))")
+TEXT_UUID_TO_BINARY = "UNHEX(REPLACE({0}, '-', ''))"
+
+DEFAULT_LAYOUT = {"binary_user_id": False, "age_index": False}
+
+_layouts = {}
+
+def configured_database(connection):
+    """
+    Name of the database 'connection' was opened on, taken from its connect
+    arguments (the pool's, for a db_pool connection; 'db' for aiomysql).
+    The 'database' property is not used: mysql.connector answers it with a
+    SELECT DATABASE() round trip.
+    """
+    pool = getattr(connection, "_pool", None)
+    if pool is not None:
+        return pool.connect_args.get("database")
+    return getattr(connection, "_database", None) or getattr(connection, "db", None) or None
+
+USER_ID_TYPE_QUERY = (
+    "SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'user_id'"
+)
+AGE_INDEX_QUERY = (
+    "SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s "
+    "AND COLUMN_NAME = 'age' AND SEQ_IN_INDEX = 1"
+)
+
+def build_layout(user_id_row, age_index_row):
+    """
+    Turns the results of USER_ID_TYPE_QUERY and AGE_INDEX_QUERY into a layout.
+    """
+    binary_user_id = bool(user_id_row) and user_id_row[0].lower() in ("binary", "varbinary")
+    return {"binary_user_id": binary_user_id, "age_index": age_index_row[0] > 0}
+
+def describe(connection, table=TABLE_NAME, refresh=False):
+    """
+    Returns {"binary_user_id": bool, "age_index": bool} for 'table' in the
+    connection's database. Results are cached per configured database name
+    (see configured_database), so a cached lookup costs no round trip; pass
+    refresh=True (or call forget) after changing the schema.
+    """
+    key = (configured_database(connection), table)
+    if key in _layouts and not refresh:
+        return _layouts[key]
+
+    cursor = connection.cursor()
+    cursor.execute(USER_ID_TYPE_QUERY, (table,))
+    user_id_row = cursor.fetchone()
+    cursor.execute(AGE_INDEX_QUERY, (table,))
+    age_index_row = cursor.fetchone()
+    cursor.close()
+
+    layout = _layouts[key] = build_layout(user_id_row, age_index_row)
+    return layout
+
+async def describe_async(connection, table=TABLE_NAME, refresh=False):
+    """
+    describe() for an aiomysql connection; both share the same cache.
+    """
+    key = (configured_database(connection), table)
+    if key in _layouts and not refresh:
+        return _layouts[key]
+
+    async with connection.cursor() as cursor:
+        await cursor.execute(USER_ID_TYPE_QUERY, (table,))
+        user_id_row = await cursor.fetchone()
+        await cursor.execute(AGE_INDEX_QUERY, (table,))
+        age_index_row = await cursor.fetchone()
+
+    layout = _layouts[key] = build_layout(user_id_row, age_index_row)
+    return layout
+
+def forget():
+    """
+    Drops every cached layout.
+    """
+    _layouts.clear()
+
+def column_expression(layout, column):
+    """
+    SQL for reading 'column' in its usual (text) form, aliased to its name.
+    MySQL resolves ORDER BY names against SELECT aliases first, so queries
+    using this must order by the qualified column (user_data.user_id);
+    otherwise they sort on the converted text and cannot use the index.
+    """
+    if column == "user_id" and layout["binary_user_id"]:
+        return f"{BINARY_UUID_TO_TEXT.format('user_id')} AS user_id"
+    return column
+
+def select_list(layout, columns=USER_COLUMNS):
+    """
+    Comma-separated SELECT list for 'columns' under the given layout.
+    """
+    return ", ".join(column_expression(layout, column) for column in columns)
+
+def user_id_placeholder(layout):
+    """
+    Placeholder for comparing user_id against a text UUID parameter.
+    """
+    return TEXT_UUID_TO_BINARY.format("%s") if layout["binary_user_id"] else "%s"
+
+def user_id_value(layout, user_id):
+    """
+    Converts a text UUID into the value stored in the user_id column.
+    """
+    if layout["binary_user_id"]:
+        return bytes.fromhex(user_id.replace("-", ""))
+    return user_id
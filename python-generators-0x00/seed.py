@@ -1,15 +1,59 @@
 import mysql.connector
 import csv
+import csv_stream
+import checkpoints
+import db_pool
+import os
+import time
 import uuid
+import schema
+import sketches
+from change_feed import latest_mark
 
 # --- Database Configuration ---
-DB_HOST = "localhost"
-DB_USER = "alx_user"
-DB_PASSWORD = "user_password"
+# Host, user, password and pooling are configured in db_pool.
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
 CSV_FILE = "user_data.csv"
 
+# --- Bulk loading ---
+INSERT_CHUNK_SIZE = 1000    # Rows per multi-row INSERT statement.
+COMMIT_EVERY = 50           # Chunks per transaction.
+PROGRESS_INTERVAL = 5       # Seconds between progress reports.
+CSV_COLUMNS = ("name", "email", "age")
+
+# --- Schema profiles for create_table ---
+# "default" keeps the original column types. "indexed" adds a covering
+# (age, user_id) index for age filters and aggregates. "compact" also stores
+# user_id as BINARY(16) and age as TINYINT UNSIGNED, which shrinks the
+# primary key carried by every secondary index entry.
+SCHEMA_PROFILES = {
+    "default": {"user_id": "VARCHAR(40)", "age": "DECIMAL(5, 2)", "age_index": False},
+    "indexed": {"user_id": "VARCHAR(40)", "age": "DECIMAL(5, 2)", "age_index": True},
+    "compact": {"user_id": "BINARY(16)", "age": "TINYINT UNSIGNED", "age_index": True},
+}
+
+# --- Deterministic user ids ---
+# user_id is uuid5(USER_ID_NAMESPACE, normalised email), so seeding the same
+# CSV twice produces the same primary keys and re-seeding is a no-op.
+USER_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "user_data.alx_prodev")
+
+def user_id_for(email):
+    """
+    Returns the deterministic user_id for an email address.
+    """
+    return str(uuid.uuid5(USER_ID_NAMESPACE, email.strip().lower()))
+
+def user_id_sql(email_expression):
+    """
+    SQL expression computing the same value as user_id_for() on the server
+    (uuid5 is SHA-1 over namespace + name with the version/variant bits set).
+    """
+    digest = f"SHA1(CONCAT(UNHEX('{USER_ID_NAMESPACE.hex}'), LOWER(TRIM({email_expression}))))"
+    return (f"LOWER(CONCAT(SUBSTR({digest}, 1, 8), '-', SUBSTR({digest}, 9, 4), '-5', "
+            f"SUBSTR({digest}, 14, 3), '-', HEX((CONV(SUBSTR({digest}, 17, 2), 16, 10) & 0x3F) | 0x80), "
+            f"SUBSTR({digest}, 19, 2), '-', SUBSTR({digest}, 21, 12)))")
+
 # --- Connect to the MYSQL database server
 def connect_db():
     """
@@ -17,13 +61,9 @@ def connect_db():
     Returns the connection object.
     """
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
+        connection = db_pool.connect()
         if connection.is_connected():
-            print(f"Successfully connected to MySQL Server (Host: {DB_HOST}, User: {DB_USER})")
+            print(f"Successfully connected to MySQL Server (Host: {db_pool.DB_HOST}, User: {db_pool.DB_USER})")
             return connection
     except mysql.connector.Error as e:
         print(f"Error connecting to MySQL Server: {e}")
@@ -49,18 +89,16 @@ def create_database(connection):
         return False
 
 # --- Connect to the ALX_prodev database ---
-def connect_to_prodev():
+def connect_to_prodev(allow_local_infile=False):
     """
     Connects to the ALX_prodev database in MySQL.
     Returns the connection object.
+    allow_local_infile must be True for insert_data(..., use_load_data=True).
     """
     try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        # LOCAL INFILE connections get a pool of their own.
+        options = {"allow_local_infile": True} if allow_local_infile else {}
+        connection = db_pool.connect(DB_NAME, **options)
         if connection.is_connected():
             print(f"Successfully connected to database '{DB_NAME}'")
             return connection
@@ -69,26 +107,39 @@ def connect_to_prodev():
         return None
 
 # --- Create the user_data table if it does not exists ---
-def create_table(connection):
+def create_table(connection, profile="default"):
     """
     Creates the 'user_data' table if it deos not exist with the required fields.
     Requires a connection to the ALX_prodev database.
+    'profile' picks the column types and indexes (see SCHEMA_PROFILES); it
+    only applies when the table is created. The generators detect the
+    layout in use (see schema.py).
     """
     if not connection:
         print("No database connection provided to create table")
         return False
+    if profile not in SCHEMA_PROFILES:
+        raise ValueError(f"profile must be one of {tuple(SCHEMA_PROFILES)}.")
+    columns = SCHEMA_PROFILES[profile]
+    age_index = ""
+    if columns["age_index"]:
+        # Covering index: age filters, MIN/MAX/AVG and percentile lookups never touch the rows.
+        age_index = f",\n            INDEX idx_{TABLE_NAME}_age_user_id (age, user_id)"
     try:
         cursor = connection.cursor()
         create_table_query = f"""
         CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-            user_id VARCHAR(40) PRIMARY KEY,
+            user_id {columns["user_id"]} PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL UNIQUE,
-            age DECIMAL(5, 2) NOT NULL
+            age {columns["age"]} NOT NULL,
+            updated_at TIMESTAMP(6) NOT NULL
+                DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+            INDEX idx_{TABLE_NAME}_updated_at (updated_at, user_id){age_index}
         );
         """
         cursor.execute(create_table_query)
-        # cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_user_id ON {TABLE_NAME} (user_id);")
+        schema.forget()
         print(f"Table '{TABLE_NAME}' ensured to exist.")
         connection.commit() # Commit DDL operations
         cursor.close()
@@ -97,63 +148,216 @@ def create_table(connection):
         print(f"Error creating table '{TABLE_NAME}': {e}")
         return False
 
+# --- Change tracking for incremental reads ---
+def ensure_change_tracking(connection):
+    """
+    Adds the 'updated_at' high-water-mark column (and its index) to a
+    'user_data' table created before change tracking existed.
+    The server maintains it on every INSERT and UPDATE, which is what the
+    change feed (change_feed.py) reads from.
+    """
+    if not connection:
+        print("No database connection provided to add change tracking.")
+        return False
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'updated_at'",
+            (TABLE_NAME,)
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"""
+            ALTER TABLE {TABLE_NAME}
+                ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+                ADD INDEX idx_{TABLE_NAME}_updated_at (updated_at, user_id)
+            """)
+            print(f"Added change tracking to '{TABLE_NAME}'.")
+        connection.commit()
+        cursor.close()
+        return True
+    except mysql.connector.Error as e:
+        print(f"Error adding change tracking to '{TABLE_NAME}': {e}")
+        return False
+
 
 # --- Inserting data to the database (if it does not exists) ---
-def insert_data(connection, csv_filepath):
+def read_csv_chunks(csv_filepath, chunk_size, skip_rows=0, use_mmap=False):
+    """
+    Generator that streams the CSV file as lists of (name, email, age) tuples,
+    chunk_size rows at a time, so the file never has to fit in memory.
+    The first 'skip_rows' data rows are skipped (used when resuming).
+    Parsing goes through csv_stream: ages are converted to float and checked
+    once per chunk, and a malformed record raises ValueError naming its
+    record number. use_mmap=True memory-maps the file instead of reading it.
+    """
+    return csv_stream.read_records(csv_filepath, CSV_COLUMNS, {"age": float}, chunk_size,
+                                   use_mmap=use_mmap, skip_rows=skip_rows)
+
+def multi_row_insert_query(row_count):
+    """
+    Builds an INSERT IGNORE statement with 'row_count' value tuples, so a
+    whole chunk goes to the server in one round trip.
+    """
+    values = ", ".join(["(%s, %s, %s, %s)"] * row_count)
+    return f"INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age) VALUES {values}"
+
+def existing_emails(cursor, emails):
+    """
+    Returns the subset of 'emails' already present in the table, using one
+    lookup on the UNIQUE email index per chunk. Matching on email (rather than
+    user_id) also recognises rows seeded before ids were deterministic.
+    """
+    if not emails:
+        return set()
+    placeholders = ", ".join(["%s"] * len(emails))
+    cursor.execute(f"SELECT email FROM {TABLE_NAME} WHERE email IN ({placeholders})", list(emails))
+    return {row[0].lower() for row in cursor.fetchall()}
+
+def load_data_infile(connection, csv_filepath, layout=schema.DEFAULT_LAYOUT):
+    """
+    Bulk loads the CSV with LOAD DATA LOCAL INFILE, letting the server parse
+    the file. The connection must allow local infile (see connect_to_prodev).
+    Returns the number of rows inserted.
+    """
+    user_id_expression = user_id_sql("@email")
+    if layout["binary_user_id"]:
+        user_id_expression = schema.TEXT_UUID_TO_BINARY.format(user_id_expression)
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {TABLE_NAME}
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        (name, @email, age)
+        SET email = @email, user_id = {user_id_expression}
+    """, (os.path.abspath(csv_filepath),))
+    connection.commit()
+    inserted = cursor.rowcount
+    cursor.close()
+    return inserted
+
+def insert_data(connection, csv_filepath, chunk_size=INSERT_CHUNK_SIZE, commit_every=COMMIT_EVERY,
+                use_load_data=False, checkpoint_path=None, use_mmap=False,
+                sketch_path=None):
     """
     Inserts data into the 'user_data' table.
-    Generates a new UUID for each user_id if not provided in data.
-    Uses INSERT IGNORE to prevent errors on duplicate entries(based on Primary key).
+    Derives each user_id from the email (uuid5), so ids are stable across runs.
+    Rows whose email is already present are skipped before inserting, and
+    INSERT IGNORE covers any race with concurrent writers.
     Requires a connctionn to connect to the ALX_prodev database.
 
+    The CSV file is streamed in chunks of 'chunk_size' rows, each sent as one
+    multi-row INSERT, and the transaction is committed every 'commit_every'
+    chunks. After each commit the number of rows done is saved to
+    'checkpoint_path' (default: '<csv_filepath>.checkpoint'); a later call
+    with the same file resumes from there. Throughput is reported in rows/s.
+
+    With 'sketch_path', the inserted rows are also added to the approximate
+    statistics stored there (see sketches.py), saved with every commit. At
+    the end the sketches are marked as current up to the newest row, so
+    4-stream_ages.update_sketches carries on from there. LOAD DATA does not
+    build sketches; run update_sketches afterwards instead.
+
     Args:
         connection: An active MySQL database connection object.
         csv_filepath (str): The path to the CSV file containing user data.
+        chunk_size (int): Rows per INSERT statement.
+        commit_every (int): Chunks per transaction.
+        use_load_data (bool): Use LOAD DATA LOCAL INFILE instead of INSERTs.
+        checkpoint_path (str): Where progress is recorded for resuming.
+        use_mmap (bool): Memory-map the CSV file instead of reading it.
+        sketch_path (str): Where approximate statistics are maintained.
     """
     if not connection:
         print("No database connection provided to insert data.")
         return False
-    
-    user_data = []
-    try:
-        # open the csv file and read its content
-        with open(csv_filepath, mode='r', newline='', encoding='utf-8') as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                user_data.append(row)
-            
-            if not user_data: # Check for empty user data after trying to read from it
-                print(f"No data found in '{csv_filepath}' to insert.")
-                return False
-            
-    except FileNotFoundError:
+    if not os.path.isfile(csv_filepath):
         print(f"Error: CSV file '{csv_filepath}' not found. Please ensure the path is correct.")
         return False
-    except Exception as e: # Catch other potential file reading errors.
-        print(f"An error occured while reading CSV file '{csv_filepath}': {e}")
+
+    start = time.perf_counter()
+    try:
+        layout = schema.describe(connection, refresh=True)
+    except mysql.connector.Error as e:
+        print(f"Error inspecting table '{TABLE_NAME}': {e}")
         return False
+    if use_load_data:
+        try:
+            inserted = load_data_infile(connection, csv_filepath, layout)
+        except mysql.connector.Error as e:
+            print(f"Error loading '{csv_filepath}' into '{TABLE_NAME}': {e}")
+            return False
+        elapsed = time.perf_counter() - start
+        print(f"Successfully inserted {inserted} rows into '{TABLE_NAME}' "
+              f"in {elapsed:.2f}s ({inserted / elapsed if elapsed else 0:.0f} rows/s).")
+        return True
+
+    checkpoint_path = checkpoint_path or f"{csv_filepath}.checkpoint"
+    rows_done = checkpoints.load_checkpoint(checkpoint_path, {}).get("rows_done", 0)
+    if rows_done:
+        print(f"Resuming '{csv_filepath}' after {rows_done} rows.")
 
+    sketch = None
+    if sketch_path:
+        sketch = sketches.load_sketches(sketch_path) or sketches.UserSketches()
+
+    cursor = None
+    inserted = 0
+    rows_read = 0
+    skipped = 0
+    last_report = start
+    full_chunk_query = multi_row_insert_query(chunk_size)
     try:
         cursor = connection.cursor()
-        # INSERT IGNORE allows the re-run of the script without errors
-        # if the same data (same user_id if already present) is attempted to be inserted.
-        insert_query = f"""
-        INSERT IGNORE INTO {TABLE_NAME}
-            (user_id, name, email, age)
-        VALUES(%s, %s, %s, %s)
-        """
+        chunks = read_csv_chunks(csv_filepath, chunk_size, skip_rows=rows_done, use_mmap=use_mmap)
+        for chunk_number, chunk in enumerate(chunks, start=1):
+            rows_read += len(chunk)
+            present = existing_emails(cursor, {email.strip().lower() for _, email, _ in chunk})
+            new_rows = [row for row in chunk if row[1].strip().lower() not in present]
+            skipped += len(chunk) - len(new_rows)
+
+            if new_rows:
+                params = []
+                for name, email, age in new_rows:
+                    params.extend((schema.user_id_value(layout, user_id_for(email)), name, email, age))
+                query = full_chunk_query if len(new_rows) == chunk_size else multi_row_insert_query(len(new_rows))
+                cursor.execute(query, params)
+                inserted += cursor.rowcount
+                if sketch is not None:
+                    sketch.update([row[1] for row in new_rows], [row[2] for row in new_rows])
 
-        # Data with generated UUIDs.
-        rows_to_insert = []
-        for row_dict in user_data:
-            new_user_id = str(uuid.uuid4())
-            rows_to_insert.append((new_user_id, row_dict['name'], row_dict['email'], float(row_dict['age'])))
+            if chunk_number % commit_every == 0:
+                connection.commit()
+                if sketch is not None:
+                    sketches.save_sketches(sketch, sketch_path)
+                checkpoints.save_checkpoint(checkpoint_path, {"rows_done": rows_done + rows_read})
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    print(f"... {rows_done + rows_read} rows loaded ({rows_read / (now - start):.0f} rows/s)")
+                    last_report = now
 
-        cursor.executemany(insert_query, rows_to_insert)
         connection.commit()
-        print(f"Successfully inserted {cursor.rowcount} rows into '{TABLE_NAME}'.")
-        cursor.close()
-        return True
+        if sketch is not None:
+            sketch.mark = latest_mark(connection)
+            sketches.save_sketches(sketch, sketch_path)
+        if rows_done + rows_read == 0:
+            print(f"No data found in '{csv_filepath}' to insert.")
+            return False
     except mysql.connector.Error as e:
         print(f"Error inserting data into '{TABLE_NAME}': {e}")
-        return False
\ No newline at end of file
+        print(f"Rerun with the same file to resume from the last committed chunk ({checkpoint_path}).")
+        return False
+    except (ValueError, IndexError, csv.Error) as e: # Malformed CSV content.
+        print(f"An error occured while reading CSV file '{csv_filepath}': {e}")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+    checkpoints.clear_checkpoint(checkpoint_path)  # Finished: the next run starts from the top.
+    elapsed = time.perf_counter() - start
+    print(f"Successfully inserted {inserted} rows into '{TABLE_NAME}' ({skipped} already present) "
+          f"in {elapsed:.2f}s ({rows_read / elapsed if elapsed else 0:.0f} rows/s).")
+    return True
@@ -0,0 +1,334 @@
+"""
+Output sinks for batch_processing results.
+
+A sink is called with one columnar batch at a time (see user_rows) and
+writes it to a file through a large buffer, optionally compressed:
+  - NDJSONSink:    one JSON object per line.
+  - CSVSink:       a header row, then one row per user.
+  - ColumnarSink:  a compact binary file holding each batch column by
+                   column (read it back with read_columnar).
+Every sink is also a context manager, so
+
+    with open_sink("adults.ndjson.gz") as sink:
+        batch_processing(1000, sink=sink)
+
+writes and closes the file. Data reaches the file when the buffer fills,
+when the flush policy says so ('flush_rows' rows or 'flush_seconds'
+seconds since the last flush, whichever comes first) and on close.
+
+Passing 'resume_at' reopens an existing output instead of starting over
+(see batch_processing(checkpoint_path=...)). An uncompressed file is cut
+back to that byte offset, as recorded by position() with the checkpoint,
+so rows written after the checkpoint are not duplicated (exactly-once).
+Compressed streams cannot be cut mid-stream. They are appended to as a
+new compressed member, so the batches after the checkpoint may be
+written twice (at-least-once).
+"""
+
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import struct
+import sys
+import time
+from array import array
+import user_rows
+
+DEFAULT_BUFFER_SIZE = 1 << 20   # 1 MiB
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+OPENERS = {
+    "gzip": lambda path, mode: gzip.open(path, mode, compresslevel=6),
+    "bz2": lambda path, mode: bz2.open(path, mode),
+    "lzma": lambda path, mode: lzma.open(path, mode),
+}
+
+def guess_compression(path):
+    """
+    Returns the compression implied by the file extension, or None.
+    """
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+def open_output(path, compression=None, buffer_size=DEFAULT_BUFFER_SIZE, resume_at=None):
+    """
+    Opens 'path' for binary writing behind a buffer of buffer_size bytes.
+    compression is None, 'gzip', 'bz2' or 'lzma'. With 'resume_at', an
+    uncompressed file is truncated to that offset and a compressed one is
+    appended to.
+    """
+    if compression is not None and compression not in OPENERS:
+        raise ValueError(f"compression must be one of {tuple(OPENERS)} or None.")
+    resuming = resume_at is not None and os.path.exists(path)
+    if compression is None:
+        if not resuming:
+            return open(path, "wb", buffering=buffer_size)
+        stream = open(path, "r+b", buffering=buffer_size)
+        stream.truncate(resume_at)
+        stream.seek(resume_at)
+        return stream
+    # The compressors write through small internal buffers; batching their
+    # input keeps the number of compress calls (and syscalls) low.
+    return io.BufferedWriter(OPENERS[compression](path, "ab" if resuming else "wb"),
+                             buffer_size=buffer_size)
+
+def as_columns(batch):
+    """
+    Returns a columnar version of a batch in any row format.
+    """
+    if isinstance(batch, dict):
+        return batch
+    if not batch:
+        return {}
+    if isinstance(batch[0], dict):
+        columns = tuple(batch[0])
+        return user_rows.to_columns([tuple(row.values()) for row in batch], columns)
+    return user_rows.to_columns(batch, batch[0]._fields)
+
+
+class Sink:
+    """
+    Base class for file sinks. Subclasses implement write_columns().
+    """
+
+    def __init__(self, path, compression="auto", flush_rows=None, flush_seconds=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE, resume_at=None):
+        if compression == "auto":
+            compression = guess_compression(path)
+        self.path = path
+        self.compression = compression
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        # A resumed file already starts with its header.
+        self.resumed = (resume_at is not None and os.path.exists(path)
+                        and (resume_at > 0 if compression is None else os.path.getsize(path) > 0))
+        self._stream = open_output(path, compression, buffer_size, resume_at)
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def __call__(self, batch):
+        """
+        Writes one batch. Returns True, as batch_processing expects of a sink.
+        """
+        batch = as_columns(batch)
+        rows = user_rows.batch_length(batch)
+        if rows:
+            self.write_columns(batch)
+            self.rows_written += rows
+            self._unflushed += rows
+            if self._flush_due():
+                self.flush()
+        return True
+
+    def _flush_due(self):
+        if self.flush_rows is not None and self._unflushed >= self.flush_rows:
+            return True
+        return (self.flush_seconds is not None
+                and time.monotonic() - self._last_flush >= self.flush_seconds)
+
+    def write_columns(self, batch):
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Pushes everything written so far to the file (and, when compressed,
+        through the compressor, which costs a little compression ratio).
+        """
+        self._stream.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def exactly_once(self):
+        """
+        True if resuming at position() drops everything written after it.
+        """
+        return self.compression is None
+
+    def position(self):
+        """
+        Flushes and fsyncs the output, then returns its size in bytes. Save
+        it with the scan checkpoint and pass it back as 'resume_at'.
+        """
+        self.flush()
+        os.fsync(self._stream.fileno())    # The compressed file objects pass fileno() through.
+        return os.path.getsize(self.path)
+
+    def close(self):
+        if not self._stream.closed:
+            self._stream.close()
+
+    @property
+    def closed(self):
+        return self._stream.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
+
+
+class NDJSONSink(Sink):
+    """
+    Writes one JSON object per row, one row per line.
+    """
+
+    def __init__(self, path, **options):
+        super().__init__(path, **options)
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def write_columns(self, batch):
+        # Values are encoded a column at a time and dropped into a per-batch
+        # line template, instead of building and encoding a dict per row.
+        encode = self._encode
+        keys = (encode(name).replace("%", "%%") for name in batch)
+        template = "{" + ",".join(f"{key}:%s" for key in keys) + "}"
+        columns = [list(map(str, values)) if isinstance(values, array) else list(map(encode, values))
+                   for values in batch.values()]
+        lines = [template % row for row in zip(*columns)]
+        lines.append("")
+        self._stream.write("\n".join(lines).encode("utf-8"))
+
+
+class CSVSink(Sink):
+    """
+    Writes a header row taken from the first batch, then one row per user.
+    """
+
+    def __init__(self, path, **options):
+        super().__init__(path, **options)
+        self._text = io.TextIOWrapper(self._stream, encoding="utf-8", newline="",
+                                      write_through=True)
+        self._writer = csv.writer(self._text)
+        self._header = None
+
+    def write_columns(self, batch):
+        if self._header is None:
+            self._header = tuple(batch)
+            if not self.resumed:
+                self._writer.writerow(self._header)
+        elif tuple(batch) != self._header:
+            raise ValueError(f"Batch columns {tuple(batch)} do not match the CSV header {self._header}.")
+        self._writer.writerows(zip(*batch.values()))
+
+    def close(self):
+        if not self._stream.closed:
+            self._text.close()  # Also closes the underlying stream.
+
+
+# --- Columnar file format ---
+# The file starts with COLUMNAR_MAGIC, followed by one block per batch:
+#   <I row count> <H column count>, then for every column:
+#   <H name length> name (UTF-8) <c type> <Q payload length> payload
+# Type 'q' (int64), 'd' (float64) or an array typecode holds fixed-width
+# little-endian values. Type 's' holds <I> byte lengths for every value
+# followed by the UTF-8 bytes of all values.
+COLUMNAR_MAGIC = b"UCOL\x01\n"
+BLOCK_HEADER = struct.Struct("<IH")
+COLUMN_HEADER = struct.Struct("<cQ")
+NAME_LENGTH = struct.Struct("<H")
+
+def encode_column(values):
+    """
+    Returns (type, payload) for one column of values.
+    """
+    if isinstance(values, array):
+        typecode, fixed = values.typecode, values
+    elif all(type(value) is int for value in values):
+        typecode, fixed = "q", array("q", values)
+    elif all(isinstance(value, float) for value in values):
+        typecode, fixed = "d", array("d", values)
+    else:
+        encoded = [str(value).encode("utf-8") for value in values]
+        lengths = array("I", map(len, encoded))
+        if sys.byteorder == "big":
+            lengths.byteswap()
+        return b"s", lengths.tobytes() + b"".join(encoded)
+    if sys.byteorder == "big":
+        fixed = array(typecode, fixed)
+        fixed.byteswap()
+    return typecode.encode("ascii"), fixed.tobytes()
+
+def decode_column(kind, payload, rows):
+    """
+    Inverse of encode_column.
+    """
+    if kind == b"s":
+        lengths = array("I")
+        lengths.frombytes(payload[:4 * rows])
+        if sys.byteorder == "big":
+            lengths.byteswap()
+        values, position = [], 4 * rows
+        for length in lengths:
+            values.append(payload[position:position + length].decode("utf-8"))
+            position += length
+        return values
+    values = array(kind.decode("ascii"))
+    values.frombytes(payload)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values if values.typecode not in ("q", "d") else values.tolist()
+
+
+class ColumnarSink(Sink):
+    """
+    Writes batches in a compact binary column-oriented format.
+    """
+
+    def __init__(self, path, **options):
+        super().__init__(path, **options)
+        if not self.resumed:
+            self._stream.write(COLUMNAR_MAGIC)
+
+    def write_columns(self, batch):
+        parts = [BLOCK_HEADER.pack(user_rows.batch_length(batch), len(batch))]
+        for name, values in batch.items():
+            name = name.encode("utf-8")
+            kind, payload = encode_column(values)
+            parts += [NAME_LENGTH.pack(len(name)), name, COLUMN_HEADER.pack(kind, len(payload)), payload]
+        self._stream.write(b"".join(parts))
+
+
+def read_columnar(path, compression="auto"):
+    """
+    Generator yielding the columnar batches stored in a ColumnarSink file.
+    """
+    if compression == "auto":
+        compression = guess_compression(path)
+    openers = {None: open, "gzip": gzip.open, "bz2": bz2.open, "lzma": lzma.open}
+    with openers[compression](path, "rb") as stream:
+        if stream.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"'{path}' is not a columnar user file.")
+        while True:
+            header = stream.read(BLOCK_HEADER.size)
+            if not header:
+                return
+            rows, column_count = BLOCK_HEADER.unpack(header)
+            batch = {}
+            for _ in range(column_count):
+                name = stream.read(NAME_LENGTH.unpack(stream.read(NAME_LENGTH.size))[0]).decode("utf-8")
+                kind, length = COLUMN_HEADER.unpack(stream.read(COLUMN_HEADER.size))
+                batch[name] = decode_column(kind, stream.read(length), rows)
+            yield batch
+
+
+SINK_TYPES = {".ndjson": NDJSONSink, ".jsonl": NDJSONSink, ".csv": CSVSink, ".ucol": ColumnarSink}
+
+def open_sink(path, **options):
+    """
+    Opens the sink matching the file extension (.ndjson/.jsonl, .csv or
+    .ucol, optionally followed by .gz, .bz2 or .xz). Keyword options are
+    passed to the sink (compression, flush_rows, flush_seconds, buffer_size).
+    """
+    base = path
+    if guess_compression(base):
+        base = os.path.splitext(base)[0]
+    extension = os.path.splitext(base)[1].lower()
+    if extension not in SINK_TYPES:
+        raise ValueError(f"Unknown sink type for '{path}'; use one of {tuple(SINK_TYPES)}.")
+    return SINK_TYPES[extension](path, **options)
@@ -0,0 +1,300 @@
+"""
+Approximate statistics over user_data, answered from small summaries
+instead of a table scan.
+
+UserSketches keeps, for every row fed to it:
+  - a ReservoirSample of ages (uniform sample of fixed size), for the
+    average age with a confidence interval,
+  - a CountMinSketch of age buckets, for row counts per bucket,
+  - a HyperLogLog of normalised emails, for the number of distinct emails.
+Each estimate comes with bounds (see UserSketches.estimates). Sketches are
+filled while seeding (seed.insert_data(sketch_path=...)) or from the change
+feed (4-stream_ages.update_sketches) and stored as JSON, so a dashboard
+query only loads a few kilobytes.
+
+Rows are counted each time they are fed in: an UPDATE seen by the change
+feed adds the row again (HyperLogLog is not affected, the others drift).
+Rebuild the sketches from scratch when that matters.
+"""
+
+import base64
+import hashlib
+import math
+import random
+from statistics import NormalDist
+from checkpoints import load_checkpoint, save_checkpoint
+
+SKETCH_PATH = "user_data.sketches.json"
+DEFAULT_CONFIDENCE = 0.95
+
+
+def hash64(key):
+    """
+    Stable 64-bit hash of a string (the same in every process, unlike hash()).
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+def z_score(confidence):
+    """
+    Two-sided normal quantile for a confidence level, e.g. 0.95 -> 1.96.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1.")
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+def estimate(value, low, high, confidence):
+    return {"estimate": value, "low": low, "high": high, "confidence": confidence}
+
+
+class ReservoirSample:
+    """
+    Uniform random sample of at most 'capacity' values from a stream of
+    unknown length (Algorithm L: after the reservoir fills, the number of
+    values to skip is drawn directly, so most values cost no random draw).
+    """
+
+    def __init__(self, capacity=10000, seed=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be a positive integer.")
+        self.capacity = capacity
+        self.seen = 0
+        self.items = []
+        self._random = random.Random(seed)
+        self._w = None
+        self._next = None   # Stream position of the next value to keep.
+
+    def _uniform(self):
+        while True:
+            u = self._random.random()
+            if u > 0:
+                return u
+
+    def _schedule(self, position):
+        self._w *= math.exp(math.log(self._uniform()) / self.capacity)
+        self._next = position + math.floor(math.log(self._uniform()) / math.log1p(-self._w)) + 1
+
+    def add(self, value):
+        position = self.seen
+        self.seen += 1
+        if len(self.items) < self.capacity:
+            self.items.append(value)
+            if len(self.items) == self.capacity:
+                self._w = 1.0
+                self._schedule(position)
+        elif position == self._next:
+            self.items[self._random.randrange(self.capacity)] = value
+            self._schedule(position)
+
+    def mean(self, confidence=DEFAULT_CONFIDENCE):
+        """
+        Estimated mean of the whole stream, with a normal confidence interval
+        (finite population corrected). Exact once every value is in the sample.
+        """
+        n, population = len(self.items), self.seen
+        if not n:
+            return estimate(None, None, None, confidence)
+        mean = math.fsum(self.items) / n
+        if n == population or n < 2:
+            margin = 0.0 if n == population else math.inf
+        else:
+            variance = math.fsum((value - mean) ** 2 for value in self.items) / (n - 1)
+            correction = (population - n) / (population - 1)
+            margin = z_score(confidence) * math.sqrt(variance / n * correction)
+        return estimate(mean, mean - margin, mean + margin, confidence)
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "seen": self.seen, "items": self.items,
+                "w": self._w, "next": self._next}
+
+    @classmethod
+    def from_dict(cls, data):
+        sample = cls(data["capacity"])
+        sample.seen, sample.items = data["seen"], list(data["items"])
+        sample._w, sample._next = data["w"], data["next"]
+        return sample
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimator using 2**precision one-byte registers.
+    The relative standard error is 1.04 / sqrt(2**precision), about 0.8%
+    for the default precision of 14 (16 KiB of registers).
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18.")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key):
+        h = hash64(key)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def count(self, confidence=DEFAULT_CONFIDENCE):
+        """
+        Estimated number of distinct keys, with bounds of z standard errors.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / math.fsum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            raw = m * math.log(m / zeros)   # Linear counting is better for small sets.
+        margin = z_score(confidence) * self.relative_error * raw
+        return estimate(raw, max(raw - margin, 0.0), raw + margin, confidence)
+
+    def to_dict(self):
+        return {"precision": self.precision,
+                "registers": base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["precision"])
+        sketch.registers = bytearray(base64.b64decode(data["registers"]))
+        return sketch
+
+
+class CountMinSketch:
+    """
+    Frequency estimates in 'depth' rows of 'width' counters. An estimate
+    never undercounts; with probability 1 - e**-depth it overcounts by at
+    most e / width times the total of everything added.
+    """
+
+    def __init__(self, width=2048, depth=5):
+        if width <= 0 or depth <= 0:
+            raise ValueError("width and depth must be positive integers.")
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = [[0] * width for _ in range(depth)]
+        self._cache = {}    # key -> columns; the keys used here (age buckets) are few.
+
+    def _columns(self, key):
+        columns = self._cache.get(key)
+        if columns is None:
+            if len(self._cache) >= 4096:
+                self._cache.clear()
+            columns = self._cache[key] = self._hash_columns(key)
+        return columns
+
+    def _hash_columns(self, key):
+        # Double hashing: row i uses h1 + i * h2, as good as independent hashes here.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        for row, column in zip(self.table, self._columns(key)):
+            row[column] += count
+        self.total += count
+
+    def count(self, key):
+        """
+        Estimated count for 'key'; the true count lies in [low, high] with
+        probability 'confidence' (set by the depth).
+        """
+        value = min(row[column] for row, column in zip(self.table, self._columns(key)))
+        low = max(value - math.e / self.width * self.total, 0)
+        return estimate(value, low, value, 1 - math.exp(-self.depth))
+
+    def to_dict(self):
+        return {"width": self.width, "depth": self.depth, "total": self.total, "table": self.table}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["width"], data["depth"])
+        sketch.total, sketch.table = data["total"], data["table"]
+        return sketch
+
+
+class UserSketches:
+    """
+    The sketches kept for user_data. 'mark' is the change-feed position
+    (see change_feed.read_changes) up to which rows have been added.
+    """
+
+    def __init__(self, bucket_width=10, sample_size=10000, precision=14, width=2048, depth=5):
+        self.bucket_width = bucket_width
+        self.rows = 0
+        self.mark = None
+        self.buckets = set()    # Bucket starts seen so far, to list them without a scan.
+        self.ages = ReservoirSample(sample_size)
+        self.emails = HyperLogLog(precision)
+        self.age_buckets = CountMinSketch(width, depth)
+
+    def bucket(self, age):
+        return int(age // self.bucket_width * self.bucket_width)
+
+    def add(self, email, age):
+        self.rows += 1
+        if email is not None:
+            self.emails.add(email.strip().lower())
+        if age is not None:
+            age = float(age)
+            start = self.bucket(age)
+            self.buckets.add(start)
+            self.ages.add(age)
+            self.age_buckets.add(str(start))
+
+    def update(self, emails, ages):
+        for email, age in zip(emails, ages):
+            self.add(email, age)
+        return self
+
+    def estimates(self, confidence=DEFAULT_CONFIDENCE):
+        """
+        Returns {"rows", "sample_size", "avg_age", "distinct_emails",
+        "age_buckets"}. Every estimate is a dictionary with 'estimate',
+        'low', 'high' and 'confidence'; age_buckets maps labels such as
+        '20-29' to one estimate each.
+        """
+        buckets = {}
+        for start in sorted(self.buckets):
+            label = f"{start}-{start + self.bucket_width - 1}"
+            buckets[label] = self.age_buckets.count(str(start))
+        return {
+            "rows": self.rows,
+            "sample_size": len(self.ages.items),
+            "avg_age": self.ages.mean(confidence),
+            "distinct_emails": self.emails.count(confidence),
+            "age_buckets": buckets,
+        }
+
+    def to_dict(self):
+        return {"bucket_width": self.bucket_width, "rows": self.rows, "mark": self.mark,
+                "buckets": sorted(self.buckets), "ages": self.ages.to_dict(),
+                "emails": self.emails.to_dict(), "age_buckets": self.age_buckets.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketches = cls(data["bucket_width"])
+        sketches.rows, sketches.mark = data["rows"], data["mark"]
+        sketches.buckets = set(data["buckets"])
+        sketches.ages = ReservoirSample.from_dict(data["ages"])
+        sketches.emails = HyperLogLog.from_dict(data["emails"])
+        sketches.age_buckets = CountMinSketch.from_dict(data["age_buckets"])
+        return sketches
+
+
+def load_sketches(path=SKETCH_PATH):
+    """
+    Returns the UserSketches stored at 'path', or None if there are none.
+    """
+    data = load_checkpoint(path)
+    return UserSketches.from_dict(data) if data is not None else None
+
+def save_sketches(sketches, path=SKETCH_PATH):
+    """
+    Atomically stores 'sketches' at 'path'.
+    """
+    save_checkpoint(path, sketches.to_dict())
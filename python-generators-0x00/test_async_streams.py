@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Unit tests for async_streams, run against an in-process stand-in for an
+aiomysql connection (no database needed):
+
+    python3 -m unittest test_async_streams
+"""
+import asyncio
+import unittest
+import schema
+from async_streams import (lazy_pagination_async, stream_user_ages_async,
+                           stream_users_async, stream_users_in_batches_async)
+
+ROWS = [(i, f"User {i}", f"user{i}@example.com", 20 + i % 50) for i in range(1, 101)]
+DESCRIPTION = [(column,) for column in ("user_id", "name", "email", "age")]
+
+
+class StandInCursor:
+    """
+    Minimal aiomysql cursor. Every fetch yields to the event loop, so a
+    prefetched fetch really is in flight; closing the cursor during one is
+    recorded as an error on the connection.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = []
+        self.fetching = 0
+
+    def __await__(self):
+        # Supports both 'await connection.cursor()' and 'async with connection.cursor()'.
+        yield from asyncio.sleep(0).__await__()
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def execute(self, query, params=()):
+        self.connection.queries.append(query)
+        if "INFORMATION_SCHEMA.COLUMNS" in query:
+            self._rows = [(self.connection.user_id_type,)]
+            return
+        if "INFORMATION_SCHEMA.STATISTICS" in query:
+            self._rows = [(0,)]
+            return
+        rows = ROWS
+        if "WHERE user_id > " in query:
+            rows = [row for row in rows if row[0] > params[0]]
+        if "LIMIT %s" in query:
+            rows = rows[:params[-1]]
+        self._rows = list(rows)
+        self.description = DESCRIPTION
+        if query.startswith("SELECT age "):
+            self._rows = [(row[3],) for row in self._rows]
+            self.description = [("age",)]
+
+    async def _fetch(self, size):
+        self.fetching += 1
+        self.connection.fetches += 1
+        try:
+            await asyncio.sleep(0.001)
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+        finally:
+            self.fetching -= 1
+
+    async def fetchmany(self, size):
+        return await self._fetch(size)
+
+    async def fetchone(self):
+        rows, self._rows = self._rows[:1], self._rows[1:]
+        return rows[0] if rows else None
+
+    async def fetchall(self):
+        return await self._fetch(len(self._rows))
+
+    async def close(self):
+        if self.fetching:
+            self.connection.errors.append("close while fetch in flight")
+        self._rows = []
+
+
+class StandInConnection:
+    """
+    Minimal aiomysql connection handing out StandInCursors.
+    """
+
+    def __init__(self, user_id_type="varchar", db="stand_in"):
+        self.db = db    # Read by schema.configured_database.
+        self.user_id_type = user_id_type
+        self.cursors = []
+        self.errors = []
+        self.queries = []
+        self.fetches = 0
+
+    def cursor(self, cursor_class=None):
+        cursor = StandInCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        if any(cursor.fetching for cursor in self.cursors):
+            self.errors.append("close while fetch in flight")
+
+
+async def collect(generator, limit=None):
+    items = []
+    async for item in generator:
+        items.append(item)
+        if limit is not None and len(items) == limit:
+            break
+    await generator.aclose()
+    return items
+
+
+class TestAsyncStreams(unittest.IsolatedAsyncioTestCase):
+    """
+    Full scans, early close and argument validation.
+    """
+
+    async def test_full_scans(self):
+        """
+        Every generator returns all rows, in order.
+        """
+        connection = StandInConnection()
+        users = await collect(stream_users_async(window_size=7, connection=connection))
+        self.assertEqual([user["user_id"] for user in users], [row[0] for row in ROWS])
+
+        batches = await collect(stream_users_in_batches_async(30, "tuple", connection=connection))
+        self.assertEqual([len(batch) for batch in batches], [30, 30, 30, 10])
+        self.assertEqual(batches[0][0].email, "user1@example.com")
+
+        pages = await collect(lazy_pagination_async(40, connection=connection))
+        self.assertEqual([page[-1]["user_id"] for page in pages], [40, 80, 100])
+
+        ages = await collect(stream_user_ages_async(connection=connection))
+        self.assertEqual(ages, [row[3] for row in ROWS])
+        self.assertEqual(connection.errors, [])
+
+    async def test_early_close_waits_for_prefetch(self):
+        """
+        Closing a generator after the first item leaves no fetch running
+        on the cursor when it is closed.
+        """
+        scans = {
+            "stream_users_async": lambda c: stream_users_async(window_size=10, connection=c),
+            "stream_users_in_batches_async": lambda c: stream_users_in_batches_async(10, connection=c),
+            "lazy_pagination_async": lambda c: lazy_pagination_async(10, connection=c),
+            "stream_user_ages_async": lambda c: stream_user_ages_async(connection=c),
+        }
+        for name, scan in scans.items():
+            with self.subTest(name):
+                connection = StandInConnection()
+                items = await collect(scan(connection), limit=1)
+                self.assertEqual(len(items), 1)
+                self.assertEqual(connection.errors, [])
+                self.assertFalse(any(cursor.fetching for cursor in connection.cursors))
+                # The first batch and one prefetched batch at most.
+                self.assertLessEqual(connection.fetches, 2)
+
+    async def test_binary_user_id_layout(self):
+        """
+        On the compact layout, user_id is read back as text and compared
+        through UNHEX, like the synchronous generators do.
+        """
+        schema.forget()
+        connection = StandInConnection(user_id_type="binary", db="stand_in_compact")
+        await collect(stream_users_in_batches_async(50, connection=connection))
+        await collect(lazy_pagination_async(60, connection=connection))
+        scans = [query for query in connection.queries if "FROM user_data" in query]
+        self.assertTrue(all("HEX(SUBSTR(user_id, 1, 4))" in query for query in scans))
+        self.assertIn("WHERE user_id > UNHEX(REPLACE(%s, '-', ''))", scans[-1])
+        self.assertIn("ORDER BY user_data.user_id", scans[-1])
+        self.assertNotIn("SELECT user_id,", " ".join(scans))
+
+    async def test_invalid_sizes(self):
+        """
+        Sizes must be positive integers.
+        """
+        connection = StandInConnection()
+        for size in (0, -1, 2.5):
+            with self.subTest(size=size):
+                with self.assertRaises(ValueError):
+                    await collect(stream_users_async(window_size=size, connection=connection))
+                with self.assertRaises(ValueError):
+                    await collect(stream_users_in_batches_async(size, connection=connection))
+                with self.assertRaises(ValueError):
+                    await collect(lazy_pagination_async(size, connection=connection))
+        self.assertEqual(connection.fetches, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the partition clauses of 1-batch_processing (no database
+needed):
+
+    python3 -m unittest test_batch_processing
+"""
+import unittest
+from mysql.connector.conversion import MySQLConverter
+from mysql.connector.cursor import RE_PY_PARAM, _ParamSubstitutor
+
+batching = __import__('1-batch_processing')
+
+
+def render(where, params):
+    """
+    Fills in 'params' the way a mysql.connector cursor does before sending
+    the statement: only '%s' is replaced, '%%' is left as it is.
+    """
+    converter = MySQLConverter()
+    quoted = [converter.quote(converter.escape(converter.to_mysql(value))) for value in params]
+    substitutor = _ParamSubstitutor(quoted)
+    rendered = RE_PY_PARAM.sub(substitutor, where.encode("utf-8"))
+    if substitutor.remaining:
+        raise AssertionError(f"{substitutor.remaining} parameters left unused")
+    return rendered.decode("utf-8")
+
+
+class TestPartitionClauses(unittest.TestCase):
+    """
+    Tests for partition_clauses with the hash strategy.
+    """
+
+    def test_hash_clauses_render_to_valid_sql(self):
+        """
+        Every clause renders to plain SQL with one bucket per partition.
+        """
+        clauses = batching.partition_clauses(4)
+        rendered = [render(where, params) for where, params in clauses]
+        self.assertEqual(rendered, [f"MOD(CRC32(user_id), 4) = {index}" for index in range(4)])
+        for sql in rendered:
+            self.assertNotIn("%", sql)
+
+    def test_unknown_strategy(self):
+        """
+        Only 'hash' and 'range' are accepted.
+        """
+        with self.assertRaises(ValueError):
+            batching.partition_clauses(4, strategy="modulo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Row representations shared by the user_data generators.
+
+Every generator can hand rows out in one of three formats:
+  - "dict":    one dictionary per row (the original behaviour).
+  - "tuple":   one UserRow namedtuple per row; no per-row dict is allocated.
+  - "columns": one dictionary per batch mapping each column name to the list
+               of its values, with 'age' stored in a typed array.
+Converting 'age' from Decimal happens once per batch over the whole column
+instead of once per row.
+"""
+
+from array import array
+from collections import namedtuple
+from decimal import Decimal
+from functools import partial
+from itertools import compress
+
+ROW_FORMATS = ("dict", "tuple", "columns")
+USER_COLUMNS = ("user_id", "name", "email", "age")
+
+UserRow = namedtuple("UserRow", USER_COLUMNS)
+
+_record_types = {USER_COLUMNS: UserRow}
+
+def record_type(columns):
+    """
+    Returns the namedtuple class for the given column names (cached).
+    """
+    columns = tuple(columns)
+    if columns not in _record_types:
+        _record_types[columns] = namedtuple("Row", columns)
+    return _record_types[columns]
+
+def validate_row_format(row_format):
+    """
+    Raises ValueError if row_format is not one of ROW_FORMATS.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}.")
+
+def convert_ages(ages):
+    """
+    Converts a whole column of ages (Decimal from MySQL) to a typed int array.
+    """
+    return array('i', map(int, ages))
+
+def to_columns(rows, columns):
+    """
+    Transposes raw cursor tuples into a {column: values} batch.
+    """
+    if rows:
+        batch = dict(zip(columns, map(list, zip(*rows))))
+    else:
+        batch = {column: [] for column in columns}
+    if "age" in batch:
+        batch["age"] = convert_ages(batch["age"])
+    return batch
+
+def convert_batch(rows, row_format, columns=USER_COLUMNS):
+    """
+    Converts a batch of raw cursor tuples into the requested row format.
+
+    Args:
+        rows (list): Tuples as returned by a non-dictionary cursor.
+        row_format (str): One of ROW_FORMATS.
+        columns (tuple): Column names, in cursor order.
+    """
+    columns = tuple(columns)
+    if row_format == "columns":
+        return to_columns(rows, columns)
+    if not rows:
+        return []
+
+    if "age" in columns and isinstance(rows[0][columns.index("age")], Decimal):
+        batch = to_columns(rows, columns)
+        rows = zip(*(batch[column] for column in columns))
+    if row_format == "tuple":
+        return list(map(record_type(columns)._make, rows))
+    return [dict(zip(columns, row)) for row in rows]
+
+def batch_length(batch):
+    """
+    Returns the number of rows in a batch of any format.
+    """
+    if isinstance(batch, dict):
+        return len(next(iter(batch.values()), ()))
+    return len(batch)
+
+def last_value(batch, column):
+    """
+    Returns 'column' of the last row of a non-empty batch of any format.
+    """
+    if isinstance(batch, dict):
+        return batch[column][-1]
+    row = batch[-1]
+    return row[column] if isinstance(row, dict) else getattr(row, column)
+
+def select_rows(batch, mask):
+    """
+    Keeps the rows of a columnar batch whose entry in 'mask' is true.
+    Each column is filtered in a single C-level pass with itertools.compress;
+    typed array columns keep their type.
+    """
+    mask = list(mask)
+    selected = {}
+    for column, values in batch.items():
+        kept = compress(values, mask)
+        selected[column] = array(values.typecode, kept) if isinstance(values, array) else list(kept)
+    return selected
+
+def project(batch, columns):
+    """
+    Returns a columnar batch restricted to the given columns, in that order.
+    """
+    return {column: batch[column] for column in columns}
+
+def iter_dicts(batch):
+    """
+    Yields the rows of a columnar batch as dictionaries.
+    """
+    columns = tuple(batch)
+    return map(dict, map(partial(zip, columns), zip(*batch.values())))